@@ -0,0 +1,149 @@
+import time
+from langchain_text_splitters import CharacterTextSplitter
+import numpy as np
+from openai import OpenAI
+import pymupdf
+
+from config import Config
+
+
+PDF_PATH = "./data/test.pdf"
+SAMPLE_SIZE = 2000
+TOP_K = 10
+FULL_DIMENSIONS = 3072
+DIMENSIONS_LIST = [3072, 1536, 1024, 512, 256]
+QUESTIONS = [
+    "What is the standard deduction for a married couple filing jointly?",
+    "Who must file a federal income tax return?",
+    "How are capital gains from the sale of a home taxed?",
+    "What expenses can a business deduct as ordinary and necessary?",
+    "How is the child tax credit calculated?",
+    "When are estimated tax payments due?",
+    "What is the penalty for filing a tax return late?",
+    "Which retirement plan contributions are tax deductible?",
+    "How is self-employment tax calculated?",
+    "What income is excluded from gross income?",
+]
+
+
+def embed(client: OpenAI, texts: list[str], batch_size: int = 256) -> np.ndarray:
+    embedding_list = []
+    for i in range(0, len(texts), batch_size):
+        response = client.embeddings.create(
+            input=texts[i : i + batch_size], model=Config.EMBEDDING_MODEL, dimensions=FULL_DIMENSIONS
+        )
+        embedding_list.extend(data.embedding for data in sorted(response.data, key=lambda x: x.index))
+    return np.asarray(embedding_list, dtype=np.float32)
+
+
+def truncate(vectors: np.ndarray, dimensions: int) -> np.ndarray:
+    # Matryoshka embeddings: a renormalized prefix is itself an embedding
+    truncated = vectors[:, :dimensions]
+    return truncated / np.linalg.norm(truncated, axis=1, keepdims=True)
+
+
+def quantize_int8(vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    scale = np.abs(vectors).max(axis=0) / 127
+    scale[scale == 0] = 1
+    return np.round(vectors / scale).astype(np.int8), scale
+
+
+def quantize_binary(vectors: np.ndarray) -> np.ndarray:
+    return np.packbits(vectors > 0, axis=1)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    if k >= scores.shape[1]:
+        return np.argsort(-scores, axis=1)
+    index = np.argpartition(-scores, k, axis=1)[:, :k]
+    order = np.take_along_axis(scores, index, axis=1).argsort(axis=1)[:, ::-1]
+    return np.take_along_axis(index, order, axis=1)
+
+
+def rescore(candidates: np.ndarray, questions: np.ndarray, corpus: np.ndarray, k: int) -> np.ndarray:
+    result = []
+    for question, candidate in zip(questions, candidates):
+        scores = corpus[candidate] @ question
+        result.append(candidate[np.argsort(-scores)[:k]])
+    return np.asarray(result)
+
+
+def recall(result: np.ndarray, truth: np.ndarray) -> float:
+    return float(np.mean([len(set(r) & set(t)) / len(t) for r, t in zip(result, truth)]))
+
+
+def search_float(questions: np.ndarray, corpus: np.ndarray, k: int) -> np.ndarray:
+    return top_k(questions @ corpus.T, k)
+
+
+def search_int8(questions: np.ndarray, codes: np.ndarray, scale: np.ndarray, k: int) -> np.ndarray:
+    # Asymmetric search: the question stays in float, the corpus is int8
+    return top_k((questions * scale) @ codes.T.astype(np.float32), k)
+
+
+def search_binary(questions: np.ndarray, bits: np.ndarray, k: int) -> np.ndarray:
+    question_bits = quantize_binary(questions)
+    hamming = np.unpackbits(question_bits[:, None, :] ^ bits[None, :, :], axis=2).sum(axis=2)
+    return top_k(-hamming.astype(np.float32), k)
+
+
+def timed(function, *args) -> tuple[np.ndarray, float]:
+    start = time.perf_counter()
+    result = function(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    client = OpenAI()
+    text_splitter = CharacterTextSplitter.from_tiktoken_encoder(
+        encoding_name=Config.TOKEN_ENCODING, chunk_size=Config.CHUNK_SIZE, chunk_overlap=Config.OVERLAP_SIZE
+    )
+
+    pdf = pymupdf.open(PDF_PATH)
+    chunk_list = []
+    for page in pdf:
+        chunk_list.extend(text_splitter.split_text(page.get_text()))
+        if len(chunk_list) >= SAMPLE_SIZE:
+            break
+    chunk_list = chunk_list[:SAMPLE_SIZE]
+
+    print(f"Embedding {len(chunk_list)} chunks and {len(QUESTIONS)} questions with {Config.EMBEDDING_MODEL}")
+    corpus_full = embed(client, chunk_list)
+    questions_full = embed(client, QUESTIONS)
+
+    # Ground truth is exact search on the full-precision, full-dimension vectors
+    truth = search_float(questions_full, corpus_full, TOP_K)
+    candidates = TOP_K * Config.RESCORE_OVERSAMPLING
+
+    print(f"\nRecall@{TOP_K} against exact {FULL_DIMENSIONS}-dimension float32 search")
+    print(f"Latency is brute-force search over {len(chunk_list)} vectors for {len(QUESTIONS)} questions\n")
+    print("| Dimensions | Storage | Rescored | Bytes / vector | Recall | Latency (ms) |")
+    print("|---|---|---|---|---|---|")
+
+    for dimensions in DIMENSIONS_LIST:
+        corpus = truncate(corpus_full, dimensions)
+        questions = truncate(questions_full, dimensions)
+        codes, scale = quantize_int8(corpus)
+        bits = quantize_binary(corpus)
+
+        result, latency = timed(search_float, questions, corpus, TOP_K)
+        rows = [("float32", "no", dimensions * 4, result, latency)]
+
+        result, latency = timed(search_int8, questions, codes, scale, TOP_K)
+        rows.append(("int8", "no", dimensions, result, latency))
+        result, latency = timed(search_int8, questions, codes, scale, candidates)
+        result, rescore_latency = timed(rescore, result, questions, corpus, TOP_K)
+        rows.append(("int8", "yes", dimensions, result, latency + rescore_latency))
+
+        result, latency = timed(search_binary, questions, bits, TOP_K)
+        rows.append(("binary", "no", dimensions // 8, result, latency))
+        result, latency = timed(search_binary, questions, bits, candidates)
+        result, rescore_latency = timed(rescore, result, questions, corpus, TOP_K)
+        rows.append(("binary", "yes", dimensions // 8, result, latency + rescore_latency))
+
+        for storage, rescored, size, result, latency in rows:
+            print(f"| {dimensions} | {storage} | {rescored} | {size} | {recall(result, truth):.3f} | {latency:.2f} |")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,8 @@
 from openai import OpenAI
 
+from config import Config
+from models.embedding import Embedding
+from models.lexical_index import LexicalIndex, reciprocal_rank_fusion
 from models.neo4j_db import Neo4jDB
 from models.hierarchy_type import HierarchyType
 from models.pinecone_db import PineconeDB
@@ -22,9 +25,7 @@ class GraphSearchResult(Section):
         """
 
 
-def get_pinecone_knowledge_base(question: str, openai_client: OpenAI, pinecone_db: PineconeDB) -> str:
-    response = openai_client.embeddings.create(input=question, model="text-embedding-3-large")
-    question_embedding = response.data[0].embedding
+def get_pinecone_knowledge_base(question_embedding: list[float], pinecone_db: PineconeDB) -> str:
     result = pinecone_db.query(query_embedding=question_embedding, top_k=3)
 
     knowledge_base_list = []
@@ -36,18 +37,28 @@ def get_pinecone_knowledge_base(question: str, openai_client: OpenAI, pinecone_d
     return "\n".join(knowledge_base_list)
 
 
-def get_neo4j_knowledge_base(question: str, neo4j_db: Neo4jDB) -> str:
-    knowledge_base_list = []
-    neo4j_vector_search = []
-    neo4j_graph_search = []
+def get_cited_sections(question: str, neo4j_db: Neo4jDB, lexical_index: LexicalIndex) -> list[tuple[Section, str]]:
+    cited_sections = []
+    for id, label in lexical_index.lookup_citations(question):
+        section = neo4j_db.get_section(query_id=id, label=label)
+        if section:
+            cited_sections.append((section, label))
+    return cited_sections
 
+
+def search_neo4j_sections(
+    question: str, question_embedding: list[float], neo4j_db: Neo4jDB, lexical_index: LexicalIndex, top_k: int = 3
+) -> list[tuple[Section, str]]:
+    neo4j_vector_search = []
     for hierarchy in HierarchyType:
-        result = neo4j_db.vector_search(question=question, label=hierarchy.value[1])
+        result = neo4j_db.vector_search(question_embedding=question_embedding, label=hierarchy.value[1])
         if result:
             neo4j_vector_search.extend(result)
     neo4j_vector_search.sort(key=lambda x: x[0], reverse=True)
 
-    for result in neo4j_vector_search[:3]:
+    candidates = {}
+    vector_ranking = []
+    for result in neo4j_vector_search:
         # score = result[0]
         id = result[1]
         level = result[2]
@@ -56,19 +67,43 @@ def get_neo4j_knowledge_base(question: str, neo4j_db: Neo4jDB) -> str:
         text = result[5]
         page_num = result[6]
 
-        graph_search_result_temp = []
-        graph_search_result_temp.append(
-            Section(
-                id=id,
-                level=level,
-                hierarchy=HierarchyType.check_hierarchy_type(title),
-                title=title,
-                text=text,
-                page_num=page_num,
-            )
+        section = Section(
+            id=id,
+            level=level,
+            hierarchy=HierarchyType.check_hierarchy_type(title),
+            title=title,
+            text=text,
+            page_num=page_num,
         )
+        candidates[id] = (section, hierarchy)
+        vector_ranking.append(id)
+
+    lexical_ranking = []
+    lexical_labels = {}
+    for _, id, label in lexical_index.search(question):
+        lexical_ranking.append(id)
+        lexical_labels[id] = label
+
+    neo4j_sections = []
+    for id in reciprocal_rank_fusion([vector_ranking, lexical_ranking])[:top_k]:
+        if id not in candidates:
+            section = neo4j_db.get_section(query_id=id, label=lexical_labels[id])
+            if section is None:
+                continue
+            candidates[id] = (section, lexical_labels[id])
+        neo4j_sections.append(candidates[id])
+
+    return neo4j_sections
 
-        result_temp = neo4j_db.graph_search(query_id=id, label=hierarchy)
+
+def get_neo4j_knowledge_base(neo4j_sections: list[tuple[Section, str]], neo4j_db: Neo4jDB) -> str:
+    knowledge_base_list = []
+    neo4j_graph_search = []
+
+    for section, label in neo4j_sections:
+        graph_search_result_temp = [section]
+
+        result_temp = neo4j_db.graph_search(query_id=section.id, label=label)
         graph_search_result_temp.extend(result_temp)
 
         for node in graph_search_result_temp:
@@ -96,6 +131,8 @@ def main():
     neo4j_db = Neo4jDB()
     pinecone_db = PineconeDB()
     openai_client = OpenAI()
+    embedding = Embedding(openai_client)
+    lexical_index = LexicalIndex.load(Config.LEXICAL_INDEX_DIR)
 
     message_history = []
     system_message = """You are a professional Tax lawyer and an accountant dealing with Tax. You answer questions from your valuable clients about tax. You only answer questions based on your knowledge base and the actual law. If you don't know the answer, you can say 'I don't know.'"""
@@ -115,13 +152,25 @@ def main():
                 context_list.append(f"Assistant: {message['content']}")
         context = "\n".join(context_list)
 
+        user_question = question
         question = f"{context[-200000:]}\nUser: {question}"
 
-        pinecone_knowledge = get_pinecone_knowledge_base(
-            question=question, openai_client=openai_client, pinecone_db=pinecone_db
-        )
+        # Provisions cited directly, e.g. "§162(a)" or "401(k)", are looked up without any embedding call
+        neo4j_sections = get_cited_sections(question=user_question, neo4j_db=neo4j_db, lexical_index=lexical_index)
+        if not neo4j_sections:
+            # Both knowledge bases share the embedding space, so the question is embedded once
+            question_embedding = embedding.embed(question)
+
+            pinecone_knowledge = get_pinecone_knowledge_base(question_embedding=question_embedding, pinecone_db=pinecone_db)
+
+            neo4j_sections = search_neo4j_sections(
+                question=user_question,
+                question_embedding=question_embedding,
+                neo4j_db=neo4j_db,
+                lexical_index=lexical_index,
+            )
 
-        neo4j_knowledge = get_neo4j_knowledge_base(question=question, neo4j_db=neo4j_db)
+        neo4j_knowledge = get_neo4j_knowledge_base(neo4j_sections=neo4j_sections, neo4j_db=neo4j_db)
 
         user_message = f"""
             I need help with a tax question. Here is my question: {question}
@@ -17,7 +17,32 @@ class Config:
 
     VECTOR_SOURCE_PROPERTY = "text"
     VECTOR_EMBEDDING_PROPERTY = "text_embedding"
+    EMBEDDING_VERSION_PROPERTY = "embedding_version"
+
+    # Shared by Pinecone and Neo4j so both knowledge bases live in the same vector space.
+    # text-embedding-3 models support shortened (Matryoshka) embeddings through `dimensions`.
+    EMBEDDING_PROVIDER = "OpenAI"
+    EMBEDDING_MODEL = "text-embedding-3-large"
+    EMBEDDING_DIMENSIONS = 1024
+    # Stored with every Neo4j node and Pinecone vector, so vectors from another model or dimension are re-embedded
+    EMBEDDING_VERSION = f"{EMBEDDING_MODEL}:{EMBEDDING_DIMENSIONS}"
+    # USD per million tokens of each model, used to estimate the embedding cost of a load
+    EMBEDDING_COST_PER_MILLION_TOKENS = {
+        "text-embedding-3-large": 0.13,
+        "text-embedding-3-small": 0.02,
+        "text-embedding-ada-002": 0.10,
+    }
+    # int8 quantized Neo4j vector index, reranked with the full-precision vectors
+    VECTOR_QUANTIZATION = True
+    RESCORE_OVERSAMPLING = 4
+
+    # Set INGEST_PROFILE=1 to write a sampling profile of each loader run
+    INGEST_PROFILE = os.getenv("INGEST_PROFILE", "").lower() in ("1", "true")
+    PROFILE_DIR = "./data/profiles"
+
+    LEXICAL_INDEX_DIR = "./data/lexical_index"
 
     TOKEN_ENCODING = "o200k_base"
+    CHUNK_THRESHOLD = 5000
     CHUNK_SIZE = 1000
     OVERLAP_SIZE = 200
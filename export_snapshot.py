@@ -0,0 +1,28 @@
+from models.neo4j_db import Neo4jDB
+from models.pinecone_db import PineconeDB
+from models.snapshot import export_lexical_index, export_neo4j, export_pinecone
+
+
+SNAPSHOT_DIR = "./data/snapshot"
+
+
+def main():
+    neo4j_db = Neo4jDB()
+    pinecone_db = PineconeDB()
+
+    print(f"Starting to export the knowledge bases to {SNAPSHOT_DIR}")
+
+    node_count, edge_count = export_neo4j(neo4j_db, SNAPSHOT_DIR)
+    print(f"Exported {node_count} nodes and {edge_count} relationships from Neo4j")
+
+    vector_count = export_pinecone(pinecone_db, SNAPSHOT_DIR)
+    print(f"Exported {vector_count} vectors from Pinecone")
+
+    lexical_node_count = export_lexical_index(SNAPSHOT_DIR)
+    print(f"Exported the lexical index of {lexical_node_count} nodes")
+
+    print(f"Finished exporting the knowledge bases to {SNAPSHOT_DIR}")
+
+
+if __name__ == "__main__":
+    main()
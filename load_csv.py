@@ -3,6 +3,7 @@ from datetime import datetime
 from neo4j import GraphDatabase
 
 from config import Config
+from models.ingest_stats import IngestStats
 
 
 CSV_FILE = "./data/tax_data.csv"
@@ -15,10 +16,12 @@ def connect_neo4j_db() -> None:
 
 
 def main():
+    stats = IngestStats("load_csv")
+    stats.start()
     kg = connect_neo4j_db()
 
     csv_data = []
-    with open(CSV_FILE, "r") as file:
+    with stats.stage("parse"), open(CSV_FILE, "r") as file:
         csv_reader = csv.DictReader(file)
         for row in csv_reader:
             csv_data.append(row)
@@ -52,29 +55,34 @@ def main():
 
     with kg.session(database=Config.NEO4J_DATABASE) as session:
         for i, row in enumerate(csv_data):
-            row["Tax Year"] = int(row["Tax Year"])
-            row["Transaction Date"] = datetime.strptime(row["Transaction Date"], "%Y-%m-%d").date()
-            row["Deductions"] = round(float(row["Deductions"]), 2)
-            row["Income"] = round(float(row["Income"]), 2)
-            row["Tax Rate"] = round(float(row["Tax Rate"]), 2)
-            row["Tax Owed"] = round(float(row["Tax Owed"]), 2)
-
-            session.run(
-                node_creation_cypher,
-                entity="Entity" + str(i),
-                taxpayer_type=row["Taxpayer Type"],
-                year=row["Tax Year"],
-                date=row["Transaction Date"],
-                income_source=row["Income Source"],
-                deduction_type=row["Deduction Type"],
-                state=row["State"],
-                income=row["Income"],
-                deductions=row["Deductions"],
-                tax_rate=row["Tax Rate"],
-                tax_owed=row["Tax Owed"],
-            )
+            with stats.stage("parse"):
+                row["Tax Year"] = int(row["Tax Year"])
+                row["Transaction Date"] = datetime.strptime(row["Transaction Date"], "%Y-%m-%d").date()
+                row["Deductions"] = round(float(row["Deductions"]), 2)
+                row["Income"] = round(float(row["Income"]), 2)
+                row["Tax Rate"] = round(float(row["Tax Rate"]), 2)
+                row["Tax Owed"] = round(float(row["Tax Owed"]), 2)
+
+            stats.count("records")
+            stats.count("db_round_trips")
+            with stats.stage("write"):
+                session.run(
+                    node_creation_cypher,
+                    entity="Entity" + str(i),
+                    taxpayer_type=row["Taxpayer Type"],
+                    year=row["Tax Year"],
+                    date=row["Transaction Date"],
+                    income_source=row["Income Source"],
+                    deduction_type=row["Deduction Type"],
+                    state=row["State"],
+                    income=row["Income"],
+                    deductions=row["Deductions"],
+                    tax_rate=row["Tax Rate"],
+                    tax_owed=row["Tax Owed"],
+                )
 
     print(f"{len(csv_data)} records loaded into Neo4j")
+    stats.finish()
 
 
 if __name__ == "__main__":
@@ -1,8 +1,12 @@
 import pymupdf4llm
 import re
 
+from config import Config
+from models.incremental_writer import IncrementalWriter
+from models.ingest_stats import IngestStats
+from models.lexical_index import LexicalIndex
 from models.neo4j_db import Neo4jDB
-from models.section import Section
+from models.section_record import SectionRecord, SectionStream
 from models.hierarchy_type import HierarchyType
 
 
@@ -18,76 +22,67 @@ def find_markdown_header(regex: str, text: str) -> tuple[int, int] | None:
     return None
 
 
-def connect_new_section(stack: list[Section], new_section: Section, neo4j_db: Neo4jDB) -> None:
-    if new_section.level > stack[-1].level:
-        new_section.parent = stack[-1]
-    else:
-        while new_section.level <= stack[-1].level:
-            node = stack.pop()
-            neo4j_db.set_section_node(node)
-        new_section.parent = stack[-1]
-    stack.append(new_section)
-    neo4j_db.set_section_node(new_section)
-
-
 def main():
-    neo4j_db = Neo4jDB()
+    stats = IngestStats("load_pdf_with_toc")
+    stats.start()
+    neo4j_db = Neo4jDB(stats=stats)
 
-    markdown = pymupdf4llm.to_markdown(doc=PDF_PATH, page_chunks=True)
+    with stats.stage("parse"):
+        markdown = pymupdf4llm.to_markdown(doc=PDF_PATH, page_chunks=True)
 
     print(f"Starting to load {len(markdown)} pages to Neo4j")
 
-    head = Section(
+    head = SectionRecord(
         level=HierarchyType.document.value[0], hierarchy=HierarchyType.document, page_num=1, title="1040 Instructions"
     )
-    stack = [head]
-    neo4j_db.set_document_node(head)
+    lexical_index = LexicalIndex()
+    writer = IncrementalWriter(neo4j_db, document=head, lexical_index=lexical_index, stats=stats)
+    stream = SectionStream(head, sink=writer)
 
     for page in markdown:
         page_num = page["metadata"]["page"]
         print(f"Processing page {page_num} of {len(markdown)}")
+        stats.count("pages")
 
         text = page["text"]
         toc = page["toc_items"]
 
-        content_list = []
-        for header in toc:
-            level = header[0]
-            title = header[1]
+        with stats.stage("split"):
+            content_list = []
+            for header in toc:
+                level = header[0]
+                title = header[1]
 
-            result = find_markdown_header(rf"[#|*| ]*{title}.*\n", text)
-            if result:
-                start_idx, end_idx = result
-                content_list.append((start_idx, end_idx, level, title))
+                result = find_markdown_header(rf"[#|*| ]*{title}.*\n", text)
+                if result:
+                    start_idx, end_idx = result
+                    content_list.append((start_idx, end_idx, level, title))
 
-        # Some content is not in order when parsing the multi-column PDFs
-        content_list.sort()
+            # Some content is not in order when parsing the multi-column PDFs
+            content_list.sort()
 
         if content_list:
             before = text[: content_list[0][0]]
             after = text[content_list[-1][1] :]
-            stack[-1].text += before
+            stream.append_text(before)
 
             for i in range(len(content_list) - 1):
                 between = text[content_list[i][1] : content_list[i + 1][0]]
-                new_section = Section(level=content_list[i][2], title=content_list[i][3], text=between, page_num=page_num)
-                connect_new_section(stack, new_section, neo4j_db)
-
-            new_section2 = Section(level=content_list[-1][2], title=content_list[-1][3], text=after, page_num=page_num)
-            connect_new_section(stack, new_section2, neo4j_db)
-        else:
-            before = text
-            stack[-1].text += before
+                new_section = SectionRecord(
+                    level=content_list[i][2], title=content_list[i][3], text=between, page_num=page_num
+                )
+                stream.push(new_section)
 
-    while stack:
-        node = stack.pop()
-        if node.level > 0:
-            neo4j_db.set_section_node(node)
+            new_section2 = SectionRecord(level=content_list[-1][2], title=content_list[-1][3], text=after, page_num=page_num)
+            stream.push(new_section2)
         else:
-            neo4j_db.set_document_node(node)
+            stream.append_text(text)
 
-    # splitting chunks
-    neo4j_db.create_chunk_node()
+    stream.close()
+    deleted = writer.delete_stale()
+    with stats.stage("lexical"):
+        lexical_index.save(Config.LEXICAL_INDEX_DIR, document_id=head.id)
+    print(f"{writer.written} sections written, {writer.moved} moved, {writer.unchanged} unchanged, {deleted} deleted")
 
     neo4j_db.add_embedding(label="Document")
     neo4j_db.add_embedding(label="Section")
@@ -95,6 +90,7 @@ def main():
     neo4j_db.create_vector_index(label="Section")
 
     print(f"Finished loading {len(markdown)} pages to Neo4j")
+    stats.finish()
 
 
 if __name__ == "__main__":
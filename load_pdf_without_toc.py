@@ -1,15 +1,19 @@
 import pymupdf
 import re
 
+from config import Config
+from models.incremental_writer import IncrementalWriter
+from models.ingest_stats import IngestStats
+from models.lexical_index import LexicalIndex
 from models.neo4j_db import Neo4jDB
-from models.section import Section
+from models.section_record import SectionRecord, SectionStream
 from models.hierarchy_type import HierarchyType
 
 
 PDF_PATH = "./data/test.pdf"
 
 
-def split_by_header(regex: str, text: str, page_num: int) -> tuple[str, list[Section]]:
+def split_by_header(regex: str, text: str, page_num: int) -> tuple[str, list[SectionRecord]]:
     match = re.split(regex, text)
     before = ""
     between = []
@@ -20,7 +24,7 @@ def split_by_header(regex: str, text: str, page_num: int) -> tuple[str, list[Sec
             content = match[i + 1]
             hierarchy = HierarchyType.check_hierarchy_type(title)
             level = hierarchy.value[0]
-            new_section = Section(level=level, hierarchy=hierarchy, title=title, text=content, page_num=page_num)
+            new_section = SectionRecord(level=level, hierarchy=hierarchy, title=title, text=content, page_num=page_num)
             between.append(new_section)
     else:
         before = text
@@ -28,48 +32,43 @@ def split_by_header(regex: str, text: str, page_num: int) -> tuple[str, list[Sec
 
 
 def main():
-    neo4j_db = Neo4jDB()
-    pdf = pymupdf.open(PDF_PATH)
+    stats = IngestStats("load_pdf_without_toc")
+    stats.start()
+    neo4j_db = Neo4jDB(stats=stats)
+    with stats.stage("parse"):
+        pdf = pymupdf.open(PDF_PATH)
 
     print(f"Starting to load {len(pdf)} pages to Neo4j")
 
-    head = Section(
+    head = SectionRecord(
         level=HierarchyType.document.value[0], hierarchy=HierarchyType.document, title="INTERNAL REVENUE TITLE", page_num=1
     )
-    stack = [head]
-    neo4j_db.set_document_node(head)
+    lexical_index = LexicalIndex()
+    writer = IncrementalWriter(neo4j_db, document=head, lexical_index=lexical_index, stats=stats)
+    stream = SectionStream(head, sink=writer)
 
     for i, page in enumerate(pdf):
         page_num = i + 1
         print(f"Processing page {page_num} of {len(pdf)}")
+        stats.count("pages")
 
-        text = page.get_text()
+        with stats.stage("parse"):
+            text = page.get_text()
 
         regex = r"((?:Subtitle [A-Z]|CHAPTER \d+|Subchapter [A-Z]|PART [I|V|X|L|C|D|M]+|§\d+\.|TABLE OF CONTENTS|EDITORIAL NOTES|AMENDMENTS|\([a-z]\) [A-Z0-9]+|\(\d+\) [A-Z0-9]+|\([A-Z]\) [A-Z0-9]+|\([i|v|x]+\) ).*)\n"
 
-        before, between = split_by_header(regex=regex, text=text, page_num=page_num)
-        stack[-1].text += before
+        with stats.stage("split"):
+            before, between = split_by_header(regex=regex, text=text, page_num=page_num)
+        stream.append_text(before)
 
         for section in between:
-            if section.hierarchy.value[0] > stack[-1].hierarchy.value[0]:
-                section.parent = stack[-1]
-            else:
-                while section.hierarchy.value[0] <= stack[-1].hierarchy.value[0]:
-                    node = stack.pop()
-                    neo4j_db.set_section_node(node)
-                section.parent = stack[-1]
-            stack.append(section)
-            neo4j_db.set_section_node(section)
-
-    while stack:
-        node = stack.pop()
-        if node.hierarchy == HierarchyType.document:
-            neo4j_db.set_document_node(node)
-        else:
-            neo4j_db.set_section_node(node)
-
-    # Split into chunks
-    neo4j_db.create_chunk_node()
+            stream.push(section)
+
+    stream.close()
+    deleted = writer.delete_stale()
+    with stats.stage("lexical"):
+        lexical_index.save(Config.LEXICAL_INDEX_DIR, document_id=head.id)
+    print(f"{writer.written} sections written, {writer.moved} moved, {writer.unchanged} unchanged, {deleted} deleted")
 
     for hierarchy in HierarchyType:
         label = hierarchy.value[1]
@@ -77,6 +76,7 @@ def main():
         neo4j_db.create_vector_index(label)
 
     print(f"Finished loading {len(pdf)} pages to Neo4j")
+    stats.finish()
 
 
 if __name__ == "__main__":
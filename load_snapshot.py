@@ -0,0 +1,28 @@
+from models.neo4j_db import Neo4jDB
+from models.pinecone_db import PineconeDB
+from models.snapshot import import_lexical_index, import_neo4j, import_pinecone
+
+
+SNAPSHOT_DIR = "./data/snapshot"
+
+
+def main():
+    neo4j_db = Neo4jDB()
+    pinecone_db = PineconeDB()
+
+    print(f"Starting to load the snapshot {SNAPSHOT_DIR}")
+
+    node_count, edge_count = import_neo4j(neo4j_db, SNAPSHOT_DIR)
+    print(f"Loaded {node_count} nodes and {edge_count} relationships to Neo4j")
+
+    vector_count = import_pinecone(pinecone_db, SNAPSHOT_DIR)
+    print(f"Loaded {vector_count} vectors to Pinecone")
+
+    lexical_node_count = import_lexical_index(SNAPSHOT_DIR)
+    print(f"Loaded the lexical index of {lexical_node_count} nodes")
+
+    print(f"Finished loading the snapshot {SNAPSHOT_DIR}")
+
+
+if __name__ == "__main__":
+    main()
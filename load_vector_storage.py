@@ -1,9 +1,11 @@
-import uuid
+import os
 from langchain_text_splitters import CharacterTextSplitter
-from openai import OpenAI
 import pymupdf
 
 from config import Config
+from models.embedding import Embedding
+from models.ingest_stats import IngestStats
+from models.node_identity import make_content_hash
 from models.pinecone_db import PineconeDB
 
 
@@ -11,42 +13,103 @@ PDF_PATH = "./data/test.pdf"
 
 
 def main():
-    pc = PineconeDB()
+    stats = IngestStats("load_vector_storage")
+    stats.start()
+    pc = PineconeDB(stats=stats)
     text_splitter = CharacterTextSplitter.from_tiktoken_encoder(
         encoding_name=Config.TOKEN_ENCODING, chunk_size=Config.CHUNK_SIZE, chunk_overlap=Config.OVERLAP_SIZE
     )
-    client = OpenAI()
-
-    pdf = pymupdf.open(PDF_PATH)
+    embedding = Embedding(stats=stats)
+
+    # A Pinecone index has a fixed dimension, so it must be recreated after EMBEDDING_DIMENSIONS changes
+    index_dimension = pc.dimension()
+    if index_dimension != Config.EMBEDDING_DIMENSIONS:
+        raise ValueError(
+            f"Pinecone index {Config.PINECONE_INDEX_NAME} has {index_dimension} dimensions, but the config uses "
+            f"{Config.EMBEDDING_DIMENSIONS}. Recreate the index with {Config.EMBEDDING_DIMENSIONS} dimensions"
+        )
+
+    with stats.stage("parse"):
+        pdf = pymupdf.open(PDF_PATH)
     print(f"Starting to load {len(pdf)} pages to Pinecone")
 
+    # Vector ids are "<document>#<content hash>", so a chunk whose text did not change between
+    # editions keeps its id and is not embedded again, even if it moved to another page.
+    id_prefix = f"{os.path.splitext(os.path.basename(PDF_PATH))[0]}#"
+    stored_ids = set(pc.list_ids(prefix=id_prefix))
+
+    # Loads before content hashes existed used random uuid4 ids without the "#" separator. They are
+    # only looked for when the index holds more vectors than this document, to avoid listing it all.
+    if pc.count() > len(stored_ids):
+        legacy_ids = [id for id in pc.list_ids() if "#" not in id]
+        if legacy_ids:
+            pc.delete(legacy_ids)
+            print(f"Deleted {len(legacy_ids)} vectors of a previous load without content hashes")
+    seen_ids = set()
+    embedded = 0
+
     for i, page in enumerate(pdf):
         page_num = i + 1
         print(f"Processing page {page_num} of {len(pdf)}")
+        stats.count("pages")
 
-        text = page.get_text()
+        with stats.stage("parse"):
+            text = page.get_text()
 
-        chunk_list = text_splitter.split_text(text)
+        with stats.stage("chunk"):
+            chunk_list = text_splitter.split_text(text)
+        stats.count("chunks", len(chunk_list))
 
-        to_upsert_queue = []
+        page_chunks = {}
         for chunk in chunk_list:
+            content_hash = make_content_hash(chunk)
+            id = f"{id_prefix}{content_hash}"
+            # Repeated boilerplate is stored once, on the first page it appears
+            if id not in seen_ids:
+                page_chunks[id] = (chunk, content_hash)
+        seen_ids.update(page_chunks)
+
+        # Vectors embedded with another model or dimension are embedded again under the same id
+        existing_ids = [id for id in page_chunks if id in stored_ids]
+        current_metadata = {
+            id: metadata
+            for id, metadata in pc.fetch_metadata(existing_ids).items()
+            if metadata.get("embedding_version") == Config.EMBEDDING_VERSION
+        }
+        for id, metadata in current_metadata.items():
+            if metadata.get("page_num") != page_num:
+                pc.update_metadata(id, {"page_num": page_num})
+
+        new_ids = [id for id in page_chunks if id not in current_metadata]
+        # One embedding request per page instead of one per chunk
+        embedding_list = embedding.embed_batch([page_chunks[id][0] for id in new_ids])
 
-            response = client.embeddings.create(input=chunk, model="text-embedding-3-large")
-            embedding = response.data[0].embedding
+        to_upsert_queue = []
+        for id, values in zip(new_ids, embedding_list):
+            chunk, content_hash = page_chunks[id]
 
             data = {
-                "id": str(uuid.uuid4()),
-                "values": embedding,
+                "id": id,
+                "values": values,
                 "metadata": {
                     "text": chunk,
                     "page_num": page_num,
+                    "content_hash": content_hash,
+                    "embedding_version": Config.EMBEDDING_VERSION,
                 },
             }
             to_upsert_queue.append(data)
 
-        pc.upsert(to_upsert_queue)
+        if to_upsert_queue:
+            pc.upsert(to_upsert_queue)
+            embedded += len(to_upsert_queue)
+
+    stale_ids = list(stored_ids - seen_ids)
+    pc.delete(stale_ids)
 
+    print(f"{embedded} chunks embedded, {len(seen_ids) - embedded} unchanged, {len(stale_ids)} deleted")
     print(f"Finished loading {len(pdf)} pages to Pinecone")
+    stats.finish()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,52 @@
+import re
+
+from models.hierarchy_type import HierarchyType
+
+
+SECTION_NUMBER_REGEX = re.compile(r"§\s*(\d+[A-Za-z]*(?:[-–]\d+)?)")
+SUBDIVISION_REGEX = re.compile(r"\(([a-zA-Z0-9]+)\)")
+# "§162(a)", "section 162(a)(1)" or a bare "401(k)". A bare number needs at least one subdivision,
+# otherwise years and amounts would be read as citations.
+QUESTION_CITATION_REGEX = re.compile(
+    r"(?:(?:§+\s*|\bsec(?:tion)?\.?\s+)(\d+[A-Za-z]*)|\b(\d+[A-Za-z]*))((?:\s?\([a-zA-Z0-9]+\))*)", re.IGNORECASE
+)
+# Subsection markers are short: "(a)", "(iv)", "(A)", "(12)". "(2023)", "(wages)" or "(three)" are not.
+SUBSECTION_MARKER_REGEX = re.compile(r"[a-z]{1,4}|[A-Z]{1,2}|\d{1,3}")
+SUBDIVISION_HIERARCHY_TYPES = (
+    HierarchyType.section_l1,
+    HierarchyType.section_l2,
+    HierarchyType.section_l3,
+    HierarchyType.section_l4,
+)
+
+
+def make_citation(parent_citation: str, hierarchy: HierarchyType, title: str) -> str:
+    # "§162. Trade or business expenses" -> "162", then "(a) In general" below it -> "162(a)"
+    if hierarchy == HierarchyType.section:
+        match = SECTION_NUMBER_REGEX.search(title)
+        return match.group(1) if match else ""
+    if hierarchy in SUBDIVISION_HIERARCHY_TYPES and parent_citation:
+        match = SUBDIVISION_REGEX.match(title)
+        if match:
+            return f"{parent_citation}({match.group(1)})"
+    return ""
+
+
+def find_citations(question: str) -> list[tuple[str, int]]:
+    # Returns (citation, minimum length). A lookup may fall back to an ancestor of the citation but
+    # never below the minimum length: the section itself for "§162(a)", the first subdivision for
+    # a bare "401(k)", so that a bare number is never read as a section on its own.
+    citation_list = []
+    for match in QUESTION_CITATION_REGEX.finditer(question):
+        section_number, bare_number, subdivisions = match.groups()
+        citation = section_number or bare_number
+        for subdivision in SUBDIVISION_REGEX.finditer(subdivisions):
+            if not SUBSECTION_MARKER_REGEX.fullmatch(subdivision.group(1)):
+                break
+            citation += subdivision.group(0)
+        if section_number:
+            citation_list.append((citation, len(section_number)))
+        elif citation != bare_number:
+            first_subdivision = SUBDIVISION_REGEX.match(citation, len(bare_number))
+            citation_list.append((citation, first_subdivision.end()))
+    return citation_list
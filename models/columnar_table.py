@@ -0,0 +1,31 @@
+import numpy as np
+
+
+# Tables are saved as .npz files. Strings are stored as one UTF-8 buffer plus offsets, so a table is
+# read back with allow_pickle=False.
+def pack_strings(values: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    encoded = [(value or "").encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(value) for value in encoded])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def unpack_strings(data: np.ndarray, offsets: np.ndarray) -> list[str]:
+    buffer = data.tobytes()
+    return [buffer[offsets[i] : offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+
+
+def save_table(path: str, string_columns: dict[str, list[str]], array_columns: dict[str, np.ndarray]) -> None:
+    arrays = dict(array_columns)
+    for name, values in string_columns.items():
+        arrays[f"{name}__data"], arrays[f"{name}__offsets"] = pack_strings(values)
+    np.savez(path, **arrays)
+
+
+def load_table(path: str, string_column_names: list[str]) -> tuple[dict[str, list[str]], dict[str, np.ndarray]]:
+    with np.load(path, allow_pickle=False) as table:
+        string_columns = {
+            name: unpack_strings(table[f"{name}__data"], table[f"{name}__offsets"]) for name in string_column_names
+        }
+        array_columns = {name: table[name] for name in table.files if "__" not in name}
+    return string_columns, array_columns
@@ -0,0 +1,24 @@
+from openai import OpenAI
+
+from config import Config
+from models.ingest_stats import IngestStats
+
+
+class Embedding:
+    def __init__(self, client: OpenAI | None = None, stats: IngestStats | None = None):
+        self.client = client or OpenAI()
+        self.stats = stats or IngestStats()
+
+    def embed(self, text: str) -> list[float]:
+        return self.embed_batch([text])[0]
+
+    def embed_batch(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+        with self.stats.stage("embed"):
+            response = self.client.embeddings.create(
+                input=texts, model=Config.EMBEDDING_MODEL, dimensions=Config.EMBEDDING_DIMENSIONS
+            )
+        self.stats.count("embedding_requests")
+        self.stats.count("embedded_tokens", response.usage.total_tokens)
+        return [data.embedding for data in sorted(response.data, key=lambda x: x.index)]
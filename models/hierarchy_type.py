@@ -1,8 +1,15 @@
 from enum import Enum
+from functools import lru_cache
 import re
 from typing import Self
 
 
+SECTION_L1_REGEX = re.compile(r"\([a-z]\) [A-Z0-9]+")
+SECTION_L2_REGEX = re.compile(r"\(\d+\) [A-Z0-9]+")
+SECTION_L3_REGEX = re.compile(r"\([A-Z]\) [A-Z0-9]+")
+SECTION_L4_REGEX = re.compile(r"\([i|v|x]+\) ")
+
+
 class HierarchyType(Enum):
     document = (0, "Document")
     subtitle = (1, "Subtitle")
@@ -20,32 +27,40 @@ class HierarchyType(Enum):
     chunk = (10, "Chunk")
 
     @classmethod
-    def check_hierarchy_type(self, title: str) -> Self:
-        if "subtitle" in title.lower():
-            return self.subtitle
-        elif "chapter" in title.lower():
-            return self.chapter
-        elif "subchapter" in title.lower():
-            return self.subchapter
-        elif "part" in title.lower():
-            return self.part
-        elif "§" in title:
-            return self.section
-        elif "table of contents" in title.lower():
-            return self.table_of_contents
-        elif "editorial notes" in title.lower():
-            return self.editorial_notes
-        elif "amendments" in title.lower():
-            return self.amendments
-        elif re.match(r"\([a-z]\) [A-Z0-9]+", title):
-            return self.section_l1
-        elif re.match(r"\(\d+\) [A-Z0-9]+", title):
-            return self.section_l2
-        elif re.match(r"\([A-Z]\) [A-Z0-9]+", title):
-            return self.section_l3
-        elif re.match(r"\([i|v|x]+\) ", title):
-            return self.section_l4
-        elif "chunk" in title.lower():
-            return self.chunk
-        else:
-            return self.document
+    def check_hierarchy_type(cls, title: str) -> Self:
+        return _check_hierarchy_type(title)
+
+
+# Headers such as "(a) IN GENERAL" or "AMENDMENTS" repeat thousands of times in a single document,
+# so the classification is cached per title.
+@lru_cache(maxsize=4096)
+def _check_hierarchy_type(title: str) -> HierarchyType:
+    lower_title = title.lower()
+    if "subtitle" in lower_title:
+        return HierarchyType.subtitle
+    elif "chapter" in lower_title:
+        return HierarchyType.chapter
+    elif "subchapter" in lower_title:
+        return HierarchyType.subchapter
+    elif "part" in lower_title:
+        return HierarchyType.part
+    elif "§" in title:
+        return HierarchyType.section
+    elif "table of contents" in lower_title:
+        return HierarchyType.table_of_contents
+    elif "editorial notes" in lower_title:
+        return HierarchyType.editorial_notes
+    elif "amendments" in lower_title:
+        return HierarchyType.amendments
+    elif SECTION_L1_REGEX.match(title):
+        return HierarchyType.section_l1
+    elif SECTION_L2_REGEX.match(title):
+        return HierarchyType.section_l2
+    elif SECTION_L3_REGEX.match(title):
+        return HierarchyType.section_l3
+    elif SECTION_L4_REGEX.match(title):
+        return HierarchyType.section_l4
+    elif "chunk" in lower_title:
+        return HierarchyType.chunk
+    else:
+        return HierarchyType.document
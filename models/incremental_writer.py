@@ -0,0 +1,65 @@
+from models.ingest_stats import IngestStats
+from models.lexical_index import LexicalIndex
+from models.neo4j_db import Neo4jDB
+from models.section_record import SectionRecord
+
+
+class IncrementalWriter:
+    # Sink for SectionStream that diffs every finished section against the content hash stored by
+    # the previous load, so only new or changed sections are written, chunked and embedded again.
+    # Every section, changed or not, is also added to the lexical index, which is rebuilt on each load.
+    def __init__(
+        self,
+        neo4j_db: Neo4jDB,
+        document: SectionRecord,
+        lexical_index: LexicalIndex | None = None,
+        stats: IngestStats | None = None,
+    ):
+        self.neo4j_db = neo4j_db
+        self.stats = stats or IngestStats()
+        self.lexical_index = lexical_index
+        self.legacy_deleted = self.__delete_legacy_document(document)
+        self.stored_hashes = neo4j_db.get_content_hashes(document.id)
+        self.seen_ids: set[str] = set()
+        self.written = 0
+        self.moved = 0
+        self.unchanged = 0
+
+    def __call__(self, section: SectionRecord) -> None:
+        self.seen_ids.add(section.id)
+        self.stats.count("sections")
+        if self.lexical_index is not None:
+            with self.stats.stage("lexical"):
+                self.lexical_index.add_section(section)
+        stored = self.stored_hashes.get(section.id)
+
+        if stored is None or stored[0] != section.content_hash:
+            self.neo4j_db.write_section(section)
+            self.written += 1
+        elif stored[1] != section.page_num:
+            # Same content on a different page, e.g. after text was inserted earlier in the document
+            self.neo4j_db.set_page_num(section)
+            self.moved += 1
+        else:
+            self.unchanged += 1
+
+    def delete_stale(self) -> int:
+        stale_ids_by_label: dict[str, list[str]] = {}
+        for id, (_, _, label) in self.stored_hashes.items():
+            if id not in self.seen_ids:
+                stale_ids_by_label.setdefault(label, []).append(id)
+        for label, ids in stale_ids_by_label.items():
+            self.neo4j_db.delete_nodes(label, ids)
+        return sum(len(ids) for ids in stale_ids_by_label.values())
+
+    def __delete_legacy_document(self, document: SectionRecord) -> int:
+        legacy_ids_by_label: dict[str, list[str]] = {}
+        for id, label in self.neo4j_db.get_legacy_nodes(document_title=document.title, document_id=document.id):
+            legacy_ids_by_label.setdefault(label, []).append(id)
+        for label, ids in legacy_ids_by_label.items():
+            self.neo4j_db.delete_nodes(label, ids)
+
+        deleted = sum(len(ids) for ids in legacy_ids_by_label.values())
+        if deleted:
+            print(f"Deleted {deleted} nodes of a previous load of '{document.title}' without content hashes")
+        return deleted
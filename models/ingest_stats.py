@@ -0,0 +1,127 @@
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+import os
+import sys
+import threading
+import time
+from typing import Iterator
+
+from config import Config
+
+
+# Embeddings computed inside Neo4j by genai.vector.encode do not report usage, so their tokens are
+# estimated from the number of characters sent
+CHARACTERS_PER_TOKEN = 4
+
+
+class SamplingProfiler:
+    # Samples the stack of the thread that started it at a fixed interval and writes the result in
+    # the folded format read by flamegraph.pl and speedscope
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples: Counter[str] = Counter()
+        self.thread_id = threading.get_ident()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.__sample, daemon=True)
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stop_event.set()
+        self.thread.join()
+
+    def dump(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            for stack, count in self.samples.most_common():
+                file.write(f"{stack} {count}\n")
+
+    def top_frames(self, limit: int = 10) -> list[tuple[str, int]]:
+        leaf_samples = Counter()
+        for stack, count in self.samples.items():
+            leaf_samples[stack.rsplit(";", 1)[-1]] += count
+        return leaf_samples.most_common(limit)
+
+    def __sample(self) -> None:
+        while not self.stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+
+class IngestStats:
+    # Collects the time spent in each ingest stage and the throughput counters of one loader run.
+    # Stage times are exclusive: time spent in a nested stage is not counted in the outer one.
+    def __init__(self, name: str = "ingest"):
+        self.name = name
+        self.stage_times: dict[str, float] = {}
+        self.counters: Counter[str] = Counter()
+        self.stage_stack: list[list] = []
+        self.start_time: float | None = None
+        self.profiler: SamplingProfiler | None = None
+
+    def start(self) -> None:
+        self.start_time = time.perf_counter()
+        if Config.INGEST_PROFILE:
+            self.profiler = SamplingProfiler()
+            self.profiler.start()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        # Each frame is [name, start time, time spent in nested stages]
+        frame = [name, time.perf_counter(), 0.0]
+        self.stage_stack.append(frame)
+        try:
+            yield
+        finally:
+            self.stage_stack.pop()
+            elapsed = time.perf_counter() - frame[1]
+            self.stage_times[name] = self.stage_times.get(name, 0) + elapsed - frame[2]
+            if self.stage_stack:
+                self.stage_stack[-1][2] += elapsed
+
+    def count(self, name: str, value: int = 1) -> None:
+        self.counters[name] += value
+
+    def finish(self) -> None:
+        total_time = time.perf_counter() - (self.start_time or time.perf_counter())
+        if self.profiler:
+            self.profiler.stop()
+        self.__print_report(total_time)
+
+        if self.profiler:
+            timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+            path = os.path.join(Config.PROFILE_DIR, f"{self.name}-{timestamp}.folded")
+            self.profiler.dump(path)
+            print(f"Sampling profile written to {path}")
+            for frame, count in self.profiler.top_frames():
+                print(f"  {count:>8} samples  {frame}")
+
+    def __print_report(self, total_time: float) -> None:
+        print("==========================================================================")
+        print(f"{self.name} finished in {total_time:.1f}s")
+
+        other_time = max(total_time - sum(self.stage_times.values()), 0)
+        for name, stage_time in sorted(self.stage_times.items(), key=lambda x: x[1], reverse=True) + [("other", other_time)]:
+            share = stage_time / total_time * 100 if total_time else 0
+            print(f"  {name:<10} {stage_time:>9.2f}s {share:>6.1f}%")
+
+        for name, value in sorted(self.counters.items()):
+            rate = value / total_time if total_time else 0
+            print(f"  {name:<28} {value:>12} {rate:>12.1f}/s")
+
+        embedded_tokens = self.counters["embedded_tokens"] + self.counters["estimated_embedded_tokens"]
+        cost_per_million_tokens = Config.EMBEDDING_COST_PER_MILLION_TOKENS.get(Config.EMBEDDING_MODEL)
+        if cost_per_million_tokens is None:
+            print(f"  No price configured for {Config.EMBEDDING_MODEL}, {embedded_tokens} tokens embedded")
+        else:
+            cost = embedded_tokens / 1_000_000 * cost_per_million_tokens
+            print(f"  Estimated embedding cost: ${cost:.4f} for {embedded_tokens} tokens")
+        print("==========================================================================")
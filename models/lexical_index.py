@@ -0,0 +1,164 @@
+from collections import Counter
+import heapq
+import math
+import os
+import re
+
+import numpy as np
+
+from models.citation import find_citations
+from models.columnar_table import load_table, save_table
+from models.section_record import SectionRecord
+
+
+TOKEN_REGEX = re.compile(r"[a-z0-9]+")
+STOP_WORDS = frozenset(
+    "a an and are as at be by for from has have if in is it its of on or shall such that the this to was which with".split()
+)
+
+LEXICAL_STRING_COLUMNS = ["citation", "citation_node_id", "citation_node_label", "node_id", "node_label", "term"]
+
+
+def tokenize(text: str) -> list[str]:
+    return [token for token in TOKEN_REGEX.findall(text.lower()) if token not in STOP_WORDS]
+
+
+def reciprocal_rank_fusion(ranking_list: list[list[str]], k: int = 60) -> list[str]:
+    scores: dict[str, float] = {}
+    for ranking in ranking_list:
+        for rank, id in enumerate(ranking):
+            scores[id] = scores.get(id, 0) + 1 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+class LexicalIndex:
+    # Citation lookup ("162(a)" -> node) and a BM25 inverted index over the section text. It is built
+    # from the sections streamed during ingest and saved next to the data, one file per document.
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.citations: dict[str, list[tuple[str, str]]] = {}
+        self.nodes: list[tuple[str, str]] = []
+        self.node_lengths: list[int] = []
+        self.total_length = 0
+        self.postings: dict[str, list[tuple[int, int]]] = {}
+
+    def add_section(self, section: SectionRecord) -> None:
+        label = section.hierarchy.value[1]
+        if section.citation:
+            self.citations.setdefault(section.citation, []).append((section.id, label))
+
+        tokens = tokenize(f"{section.title}\n{section.text}")
+        if not tokens:
+            return
+
+        node_idx = len(self.nodes)
+        self.nodes.append((section.id, label))
+        self.node_lengths.append(len(tokens))
+        self.total_length += len(tokens)
+        for term, frequency in Counter(tokens).items():
+            self.postings.setdefault(term, []).append((node_idx, frequency))
+
+    def merge(self, other: "LexicalIndex") -> None:
+        offset = len(self.nodes)
+        self.nodes.extend(other.nodes)
+        self.node_lengths.extend(other.node_lengths)
+        self.total_length += other.total_length
+        for term, posting_list in other.postings.items():
+            self.postings.setdefault(term, []).extend((node_idx + offset, frequency) for node_idx, frequency in posting_list)
+        for citation, node_list in other.citations.items():
+            self.citations.setdefault(citation, []).extend(node_list)
+
+    # region Search
+    def lookup_citations(self, question: str) -> list[tuple[str, str]]:
+        # Falls back to the closest cited ancestor, e.g. "162(a)(9)" -> "162(a)" when (9) does not exist
+        node_list = []
+        for citation, minimum_length in find_citations(question):
+            while citation not in self.citations and len(citation) > minimum_length:
+                citation = citation[: citation.rindex("(")]
+            for node in self.citations.get(citation, []):
+                if node not in node_list:
+                    node_list.append(node)
+        return node_list
+
+    def search(self, question: str, top_k: int = 10) -> list[tuple[float, str, str]]:
+        if not self.nodes:
+            return []
+
+        node_count = len(self.nodes)
+        average_length = self.total_length / node_count
+        scores: dict[int, float] = {}
+        for term in set(tokenize(question)):
+            posting_list = self.postings.get(term)
+            if not posting_list:
+                continue
+            idf = math.log(1 + (node_count - len(posting_list) + 0.5) / (len(posting_list) + 0.5))
+            for node_idx, frequency in posting_list:
+                length_norm = self.k1 * (1 - self.b + self.b * self.node_lengths[node_idx] / average_length)
+                scores[node_idx] = scores.get(node_idx, 0) + idf * frequency * (self.k1 + 1) / (frequency + length_norm)
+
+        best = heapq.nlargest(top_k, scores.items(), key=lambda x: x[1])
+        return [(score, *self.nodes[node_idx]) for node_idx, score in best]
+
+    # endregion
+
+    # region Persistence
+    def to_columns(self) -> tuple[dict[str, list[str]], dict[str, np.ndarray]]:
+        # The postings are flattened term by term, term_offsets[i]:term_offsets[i + 1] are those of terms[i]
+        term_list = list(self.postings)
+        term_offsets = np.zeros(len(term_list) + 1, dtype=np.int64)
+        term_offsets[1:] = np.cumsum([len(self.postings[term]) for term in term_list])
+        posting_list = [posting for term in term_list for posting in self.postings[term]]
+        citation_list = [(citation, node) for citation, node_list in self.citations.items() for node in node_list]
+
+        string_columns = {
+            "citation": [citation for citation, _ in citation_list],
+            "citation_node_id": [id for _, (id, _) in citation_list],
+            "citation_node_label": [label for _, (_, label) in citation_list],
+            "node_id": [id for id, _ in self.nodes],
+            "node_label": [label for _, label in self.nodes],
+            "term": term_list,
+        }
+        array_columns = {
+            "node_length": np.asarray(self.node_lengths, dtype=np.int32),
+            "term_offsets": term_offsets,
+            "posting_node": np.asarray([node_idx for node_idx, _ in posting_list], dtype=np.int32),
+            "posting_frequency": np.asarray([frequency for _, frequency in posting_list], dtype=np.int32),
+        }
+        return string_columns, array_columns
+
+    @classmethod
+    def from_columns(cls, string_columns: dict[str, list[str]], array_columns: dict[str, np.ndarray]) -> "LexicalIndex":
+        lexical_index = cls()
+        for citation, id, label in zip(
+            string_columns["citation"], string_columns["citation_node_id"], string_columns["citation_node_label"]
+        ):
+            lexical_index.citations.setdefault(citation, []).append((id, label))
+
+        lexical_index.nodes = list(zip(string_columns["node_id"], string_columns["node_label"]))
+        lexical_index.node_lengths = array_columns["node_length"].tolist()
+        lexical_index.total_length = sum(lexical_index.node_lengths)
+
+        term_offsets = array_columns["term_offsets"]
+        posting_nodes = array_columns["posting_node"].tolist()
+        posting_frequencies = array_columns["posting_frequency"].tolist()
+        for i, term in enumerate(string_columns["term"]):
+            start, end = int(term_offsets[i]), int(term_offsets[i + 1])
+            lexical_index.postings[term] = list(zip(posting_nodes[start:end], posting_frequencies[start:end]))
+        return lexical_index
+
+    def save(self, directory: str, document_id: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        save_table(os.path.join(directory, f"{document_id}.npz"), *self.to_columns())
+
+    @classmethod
+    def load(cls, directory: str) -> "LexicalIndex":
+        lexical_index = cls()
+        if not os.path.isdir(directory):
+            return lexical_index
+        for file_name in sorted(os.listdir(directory)):
+            if file_name.endswith(".npz"):
+                lexical_index.merge(cls.from_columns(*load_table(os.path.join(directory, file_name), LEXICAL_STRING_COLUMNS)))
+        return lexical_index
+
+    # endregion
@@ -1,170 +1,353 @@
+from typing import Iterator
 from langchain_text_splitters import CharacterTextSplitter
 from neo4j import GraphDatabase
+import numpy as np
 import tiktoken
-import uuid
 
 from config import Config
+from models.node_identity import make_content_hash, make_node_id
 from models.section import Section
+from models.section_record import SectionRecord
 from models.hierarchy_type import HierarchyType
+from models.ingest_stats import CHARACTERS_PER_TOKEN, IngestStats
+
+
+# Replaces the chunks of `section` with `$chunks` in the same query that writes the section
+REPLACE_CHUNKS_CYPHER = """
+    OPTIONAL MATCH (section)-[:HAS_CHUNK]->(old_chunk:Chunk)
+    DETACH DELETE old_chunk
+    WITH DISTINCT section
+    UNWIND $chunks AS chunk_data
+    CREATE (chunk:Chunk {id: chunk_data.id})
+    SET chunk.level = $chunk_level, chunk.hierarchy = $chunk_hierarchy, chunk.title = "", chunk.text = chunk_data.text, chunk.page_num = $page_num, chunk.content_hash = chunk_data.content_hash
+    CREATE (section)-[:HAS_CHUNK]->(chunk)
+"""
 
 
 class Neo4jDB:
-    def __init__(self):
+    def __init__(self, stats: IngestStats | None = None):
         kg = GraphDatabase.driver(Config.NEO4J_URI, auth=(Config.NEO4J_USERNAME, Config.NEO4J_PASSWORD))
         kg.verify_connectivity()
         self.kg = kg
+        self.stats = stats or IngestStats()
 
-    # region Split Text
-    def create_chunk_node(self) -> None:
-        text_splitter = CharacterTextSplitter.from_tiktoken_encoder(
+        # Built once and reused for every section written during a load
+        self.encoder = tiktoken.get_encoding(Config.TOKEN_ENCODING)
+        self.text_splitter = CharacterTextSplitter.from_tiktoken_encoder(
             encoding_name=Config.TOKEN_ENCODING,
             chunk_size=Config.CHUNK_SIZE,
             chunk_overlap=Config.OVERLAP_SIZE,
         )
-        encoder = tiktoken.get_encoding("o200k_base")
-
-        for hierarchy in HierarchyType:
-            query_all_law_section = f"""
-                MATCH (section:{hierarchy.value[1]})
-                RETURN section
-            """
-
-            with self.kg.session(database=Config.NEO4J_DATABASE) as session:
-                all_law_sections = session.run(query_all_law_section)
-
-                for record in all_law_sections:
-                    parent = record["section"]
-                    parent_id = parent["id"]
-                    text = parent["text"]
-                    page_num = parent["page_num"]
-                    hierarchy = parent["hierarchy"]
-
-                    tokens = encoder.encode(text)
-                    if len(tokens) >= 5000:
-                        chunk_list = text_splitter.split_text(text)
-                        for chunk in chunk_list:
-                            create_chunk_cypher = f"""
-                                MERGE (chunk:Chunk {{id: $id}})
-                                ON CREATE SET chunk.level = $level, chunk.hierarchy = $hierarchy, chunk.title = $title, chunk.text = $text, chunk.page_num = $page_num
-
-                                WITH chunk
-                                MATCH (parent:{hierarchy} {{id: $parent_id}})
-                                SET parent.text = ""
-
-                                WITH chunk, parent
-                                MERGE (parent)-[:HAS_CHUNK]->(chunk)
-
-                                RETURN chunk
-                            """
-                            with self.kg.session(database=Config.NEO4J_DATABASE) as session:
-                                session.run(
-                                    create_chunk_cypher,
-                                    id=str(uuid.uuid4()),
-                                    level=HierarchyType.chunk.value[0],
-                                    hierarchy=HierarchyType.chunk.value[1],
-                                    title="",  # title is not needed for chunk
-                                    text=chunk,
-                                    page_num=page_num,
-                                    parent_id=parent_id,
-                                )
+
+    # region Split Text
+    def split_into_chunks(self, section: SectionRecord) -> tuple[str, list[dict]]:
+        # Returns the text to keep on the node and the chunks to attach to it. A long text is moved
+        # entirely into chunks and the node keeps an empty text, as before.
+        text = section.text
+        # A token covers at least one byte, so short texts never need the tokenizer
+        if len(text.encode("utf-8")) < Config.CHUNK_THRESHOLD:
+            return text, []
+        if len(self.encoder.encode_ordinary(text)) < Config.CHUNK_THRESHOLD:
+            return text, []
+
+        chunk_list = []
+        for i, chunk in enumerate(self.text_splitter.split_text(text)):
+            chunk_list.append(
+                {
+                    "id": make_node_id(f"{section.id}/chunk/{i}"),
+                    "text": chunk,
+                    "content_hash": make_content_hash(chunk),
+                }
+            )
+        return "", chunk_list
 
     # endregion
 
     # region Add Nodes
-    def set_document_node(self, law_section: Section) -> None:
-        set_document_cypher = """
-            MERGE (doc:Document {id: $id})
-            SET doc.level = $level, doc.hierarchy = $hierarchy, doc.title = $title, doc.text = $text, doc.page_num = $page_num
-            RETURN doc
+    def write_section(self, section: SectionRecord) -> None:
+        if section.hierarchy == HierarchyType.document:
+            self.set_document_node(section)
+        else:
+            self.set_section_node(section)
+
+    def set_document_node(self, law_section: SectionRecord) -> None:
+        # Rewriting a node drops its embedding and replaces its chunks so both are rebuilt from the new text
+        set_document_cypher = f"""
+            MERGE (doc:Document {{id: $id}})
+            SET doc.level = $level, doc.hierarchy = $hierarchy, doc.title = $title, doc.text = $text, doc.page_num = $page_num, doc.content_hash = $content_hash
+            REMOVE doc.{Config.VECTOR_EMBEDDING_PROPERTY}
+            WITH doc AS section
+            {REPLACE_CHUNKS_CYPHER}
         """
-        with self.kg.session(database=Config.NEO4J_DATABASE) as session:
+        with self.stats.stage("chunk"):
+            text, chunk_list = self.split_into_chunks(law_section)
+            self.stats.count("chunks", len(chunk_list))
+
+        with self.stats.stage("write"), self.kg.session(database=Config.NEO4J_DATABASE) as session:
+            self.stats.count("db_round_trips")
             session.run(
                 set_document_cypher,
-                id=str(law_section.id),
+                id=law_section.id,
                 level=HierarchyType.document.value[0],
                 hierarchy=HierarchyType.document.value[1],
                 title=law_section.title,
-                text=law_section.text,
+                text=text,
                 page_num=law_section.page_num,
+                content_hash=law_section.content_hash,
+                chunks=chunk_list,
+                chunk_level=HierarchyType.chunk.value[0],
+                chunk_hierarchy=HierarchyType.chunk.value[1],
             )
 
-    def set_section_node(self, section: Section) -> None:
-        if section.parent and section.parent.hierarchy == HierarchyType.document:
-            set_section_cypher = f"""
-                MATCH (doc:Document {{id: $parent_id}})
-                MERGE (section:{section.hierarchy.value[1]} {{id: $id}})
-                SET section.level = $level, section.hierarchy = $hierarchy, section.title = $title, section.text = $text, section.page_num = $page_num
-                MERGE (doc)-[:HAS_SECTION]->(section)
-                RETURN section
-            """
-        elif section.parent and section.parent.level > 0:
-            set_section_cypher = f"""
-                MATCH (parent:{section.parent.hierarchy.value[1]} {{id: $parent_id}})
-                MERGE (section:{section.hierarchy.value[1]} {{id: $id}})
-                SET section.level = $level, section.hierarchy = $hierarchy, section.title = $title, section.text = $text, section.page_num = $page_num
-                MERGE (parent)-[:HAS_SECTION]->(section)
-                RETURN section
-            """
-        else:
+    def set_section_node(self, section: SectionRecord) -> None:
+        if section.parent_id is None:
             raise ValueError("Section must have a parent")
 
-        with self.kg.session(database=Config.NEO4J_DATABASE) as session:
+        # Sections are written once they are finished, which is before their parent is finished.
+        # MERGE creates a placeholder parent that is filled in when the parent itself is written.
+        set_section_cypher = f"""
+            MERGE (parent:{section.parent_hierarchy.value[1]} {{id: $parent_id}})
+            MERGE (section:{section.hierarchy.value[1]} {{id: $id}})
+            SET section.level = $level, section.hierarchy = $hierarchy, section.title = $title, section.text = $text, section.page_num = $page_num, section.content_hash = $content_hash
+            REMOVE section.{Config.VECTOR_EMBEDDING_PROPERTY}
+            MERGE (parent)-[:HAS_SECTION]->(section)
+            WITH section
+            {REPLACE_CHUNKS_CYPHER}
+        """
+        with self.stats.stage("chunk"):
+            text, chunk_list = self.split_into_chunks(section)
+            self.stats.count("chunks", len(chunk_list))
+
+        with self.stats.stage("write"), self.kg.session(database=Config.NEO4J_DATABASE) as session:
+            self.stats.count("db_round_trips")
             session.run(
                 set_section_cypher,
-                parent_id=str(section.parent.id),
-                id=str(section.id),
+                parent_id=section.parent_id,
+                id=section.id,
                 level=section.level,
                 hierarchy=section.hierarchy.value[1],
                 title=section.title,
-                text=section.text,
+                text=text,
                 page_num=section.page_num,
+                content_hash=section.content_hash,
+                chunks=chunk_list,
+                chunk_level=HierarchyType.chunk.value[0],
+                chunk_hierarchy=HierarchyType.chunk.value[1],
             )
 
+    def set_page_num(self, section: SectionRecord) -> None:
+        set_page_num_cypher = f"""
+            MATCH (section:{section.hierarchy.value[1]} {{id: $id}})
+            SET section.page_num = $page_num
+            WITH section
+            OPTIONAL MATCH (section)-[:HAS_CHUNK]->(chunk:Chunk)
+            SET chunk.page_num = $page_num
+        """
+        with self.stats.stage("write"), self.kg.session(database=Config.NEO4J_DATABASE) as session:
+            self.stats.count("db_round_trips")
+            session.run(set_page_num_cypher, id=section.id, page_num=section.page_num)
+
+    # endregion
+
+    # region Incremental Load
+    def get_content_hashes(self, document_id: str) -> dict[str, tuple[str, int, str]]:
+        get_content_hashes_cypher = """
+            MATCH (doc:Document {id: $document_id})-[:HAS_SECTION*0..]->(section)
+            RETURN section.id AS id, section.content_hash AS content_hash, section.page_num AS page_num,
+                labels(section)[0] AS label
+        """
+        content_hashes = {}
+        with self.stats.stage("diff"), self.kg.session(database=Config.NEO4J_DATABASE) as session:
+            self.stats.count("db_round_trips")
+            result = session.run(get_content_hashes_cypher, document_id=document_id)
+            for record in result:
+                content_hashes[record["id"]] = (record["content_hash"], record["page_num"], record["label"])
+        return content_hashes
+
+    def get_legacy_nodes(self, document_title: str, document_id: str) -> list[tuple[str, str]]:
+        # Loads before content hashes existed used random ids, so their Document can only be found by
+        # title. Its whole tree, chunks included, is replaced by the new load.
+        get_legacy_nodes_cypher = """
+            MATCH (doc:Document {title: $document_title})
+            WHERE doc.content_hash IS NULL AND doc.id <> $document_id
+            MATCH (doc)-[:HAS_SECTION|HAS_CHUNK*0..]->(node)
+            RETURN DISTINCT node.id AS id, labels(node)[0] AS label
+        """
+        with self.stats.stage("diff"), self.kg.session(database=Config.NEO4J_DATABASE) as session:
+            self.stats.count("db_round_trips")
+            result = session.run(get_legacy_nodes_cypher, document_title=document_title, document_id=document_id)
+            return [(record["id"], record["label"]) for record in result]
+
+    def delete_nodes(self, label: str, ids: list[str], batch_size: int = 1000) -> None:
+        delete_nodes_cypher = f"""
+            MATCH (section:{label}) WHERE section.id IN $ids
+            OPTIONAL MATCH (section)-[:HAS_CHUNK]->(chunk:Chunk)
+            DETACH DELETE chunk, section
+        """
+        with self.stats.stage("write"), self.kg.session(database=Config.NEO4J_DATABASE) as session:
+            for i in range(0, len(ids), batch_size):
+                self.stats.count("db_round_trips")
+                session.run(delete_nodes_cypher, ids=ids[i : i + batch_size])
+
     # endregion
 
     # region Embedding
     def add_embedding(self, label: str):
+        # Only nodes that are new, were rewritten since the last load, or were embedded with another
+        # model or dimension are embedded
         add_embedding_cypher = f"""
             MATCH (section:{label})
-            WITH section, genai.vector.encode(
+            WHERE section.{Config.VECTOR_EMBEDDING_PROPERTY} IS NULL
+                OR coalesce(section.{Config.EMBEDDING_VERSION_PROPERTY}, '') <> $embedding_version
+            WITH section,
                 CASE
                     WHEN section.text IS NOT NULL AND section.text <> '' THEN section.text
                     WHEN section.title IS NOT NULL AND section.title <> '' THEN section.title
                     ELSE ' '
-                END,
-                'OpenAI',
-                {{token: $api_key}}) AS propertyVector
+                END AS source
+            WITH section, source, genai.vector.encode(
+                source,
+                '{Config.EMBEDDING_PROVIDER}',
+                {{token: $api_key, model: $model, dimensions: $dimensions}}) AS propertyVector
             CALL db.create.setNodeVectorProperty(section, '{Config.VECTOR_EMBEDDING_PROPERTY}', propertyVector)
+            SET section.{Config.EMBEDDING_VERSION_PROPERTY} = $embedding_version
+            RETURN count(section) AS node_count, sum(size(source)) AS character_count
         """
-        with self.kg.session(database=Config.NEO4J_DATABASE) as session:
-            session.run(add_embedding_cypher, api_key=Config.OPENAI_API_KEY)
+        with self.stats.stage("embed"), self.kg.session(database=Config.NEO4J_DATABASE) as session:
+            self.stats.count("db_round_trips")
+            record = session.run(
+                add_embedding_cypher,
+                api_key=Config.OPENAI_API_KEY,
+                model=Config.EMBEDDING_MODEL,
+                dimensions=Config.EMBEDDING_DIMENSIONS,
+                embedding_version=Config.EMBEDDING_VERSION,
+            ).single()
+            if record:
+                self.stats.count("embedded_nodes", record["node_count"])
+                character_count = record["character_count"] or 0
+                self.stats.count("estimated_embedded_tokens", character_count // CHARACTERS_PER_TOKEN)
 
     def create_vector_index(self, label: str):
-        create_index_cypher = (
-            f"""
+        # With quantization enabled the index keeps int8 vectors, while the node property keeps the
+        # full-precision vector used for rescoring in vector_search
+        self.__drop_outdated_vector_index(label)
+        create_index_cypher = f"""
             CREATE VECTOR INDEX `index_{label}` IF NOT EXISTS
             FOR (s: {label}) ON (s.{Config.VECTOR_EMBEDDING_PROPERTY})
+            OPTIONS {{ indexConfig: {{
+                `vector.dimensions`: {Config.EMBEDDING_DIMENSIONS},
+                `vector.similarity_function`: 'cosine',
+                `vector.quantization.enabled`: {str(Config.VECTOR_QUANTIZATION).lower()}
+            }} }}
         """
-            + """
-            OPTIONS { indexConfig: {
-                `vector.dimensions`: 1536,
-                `vector.similarity_function`: 'cosine'
-            } }
+        with self.stats.stage("index"), self.kg.session(database=Config.NEO4J_DATABASE) as session:
+            self.stats.count("db_round_trips")
+            session.run(create_index_cypher)
+
+    def __drop_outdated_vector_index(self, label: str) -> None:
+        # CREATE VECTOR INDEX IF NOT EXISTS keeps an index built for another dimension or quantization,
+        # which would reject every query embedding, so it is dropped and created again
+        show_index_cypher = """
+            SHOW VECTOR INDEXES YIELD name, options
+            WHERE name = $index_name
+            RETURN options.indexConfig AS index_config
+        """
+        index_name = f"index_{label}"
+        with self.stats.stage("index"), self.kg.session(database=Config.NEO4J_DATABASE) as session:
+            self.stats.count("db_round_trips")
+            record = session.run(show_index_cypher, index_name=index_name).single()
+            if record is None:
+                return
+
+            index_config = record["index_config"]
+            quantization = index_config.get("vector.quantization.enabled", Config.VECTOR_QUANTIZATION)
+            if index_config["vector.dimensions"] == Config.EMBEDDING_DIMENSIONS and quantization == Config.VECTOR_QUANTIZATION:
+                return
+
+            print(f"Dropping vector index {index_name} built with {index_config['vector.dimensions']} dimensions")
+            self.stats.count("db_round_trips")
+            session.run(f"DROP INDEX `{index_name}` IF EXISTS")
+
+    # endregion
+
+    # region Snapshot
+    def create_id_index(self, label: str) -> None:
+        create_index_cypher = f"""
+            CREATE INDEX `index_{label}_id` IF NOT EXISTS
+            FOR (s: {label}) ON (s.id)
         """
-        )
         with self.kg.session(database=Config.NEO4J_DATABASE) as session:
             session.run(create_index_cypher)
 
+    def export_nodes(self, label: str) -> Iterator[dict]:
+        export_nodes_cypher = f"""
+            MATCH (node:{label})
+            RETURN node.id AS id, node.level AS level, node.hierarchy AS hierarchy, node.title AS title, node.text AS text,
+                node.page_num AS page_num, node.content_hash AS content_hash,
+                node.{Config.VECTOR_EMBEDDING_PROPERTY} AS embedding, node.{Config.EMBEDDING_VERSION_PROPERTY} AS embedding_version
+        """
+        with self.kg.session(database=Config.NEO4J_DATABASE) as session:
+            for record in session.run(export_nodes_cypher):
+                yield record.data()
+
+    def export_edges(self) -> Iterator[dict]:
+        export_edges_cypher = """
+            MATCH (parent)-[relationship:HAS_SECTION|HAS_CHUNK]->(child)
+            RETURN parent.id AS parent_id, labels(parent)[0] AS parent_label, type(relationship) AS type,
+                child.id AS child_id, labels(child)[0] AS child_label
+        """
+        with self.kg.session(database=Config.NEO4J_DATABASE) as session:
+            for record in session.run(export_edges_cypher):
+                yield record.data()
+
+    def import_nodes(self, label: str, rows: list[dict], embeddings: np.ndarray, batch_size: int = 1000) -> None:
+        # Each row points at its embedding with embedding_row, so only one batch of vectors is a Python list at a time
+        import_nodes_cypher = f"""
+            UNWIND $rows AS row
+            MERGE (node:{label} {{id: row.id}})
+            SET node.level = row.level, node.hierarchy = row.hierarchy, node.title = row.title, node.text = row.text,
+                node.page_num = row.page_num, node.content_hash = row.content_hash
+            WITH node, row
+            WHERE row.embedding IS NOT NULL
+            CALL db.create.setNodeVectorProperty(node, '{Config.VECTOR_EMBEDDING_PROPERTY}', row.embedding)
+            SET node.{Config.EMBEDDING_VERSION_PROPERTY} = $embedding_version
+        """
+        with self.kg.session(database=Config.NEO4J_DATABASE) as session:
+            for i in range(0, len(rows), batch_size):
+                batch = [
+                    {**row, "embedding": None if row["embedding_row"] is None else embeddings[row["embedding_row"]].tolist()}
+                    for row in rows[i : i + batch_size]
+                ]
+                session.run(import_nodes_cypher, rows=batch, embedding_version=Config.EMBEDDING_VERSION)
+
+    def import_edges(self, parent_label: str, relationship: str, child_label: str, rows: list[dict], batch_size: int = 5000):
+        import_edges_cypher = f"""
+            UNWIND $rows AS row
+            MATCH (parent:{parent_label} {{id: row.parent_id}})
+            MATCH (child:{child_label} {{id: row.child_id}})
+            MERGE (parent)-[:{relationship}]->(child)
+        """
+        with self.kg.session(database=Config.NEO4J_DATABASE) as session:
+            for i in range(0, len(rows), batch_size):
+                session.run(import_edges_cypher, rows=rows[i : i + batch_size])
+
     # endregion
 
     # region Search
-    def vector_search(self, question: str, label: str) -> list[tuple[float, str, str, str, int]]:
+    def vector_search(
+        self, question_embedding: list[float], label: str, top_k: int = 2
+    ) -> list[tuple[float, str, str, str, int]]:
         search_result_list = []
-        vector_search_query = """
-            WITH genai.vector.encode($question, 'OpenAI', {token: $openai_key}) AS question_embedding
-            CALL db.index.vector.queryNodes($index_name, $top_k, question_embedding) YIELD node, score
+        # The index returns approximate (quantized) scores, so more candidates than needed are fetched
+        # and reranked by exact cosine similarity on the stored full-precision vectors
+        vector_search_query = f"""
+            CALL db.index.vector.queryNodes($index_name, $candidates, $question_embedding) YIELD node
+            WITH node, vector.similarity.cosine(node.{Config.VECTOR_EMBEDDING_PROPERTY}, $question_embedding) AS score
+            ORDER BY score DESC
+            LIMIT $top_k
             RETURN score, node.id, node.level, node.hierarchy, node.title, node.text, node.page_num
         """
+        candidates = top_k * Config.RESCORE_OVERSAMPLING if Config.VECTOR_QUANTIZATION else top_k
 
         with self.kg.session(database=Config.NEO4J_DATABASE) as session:
             search_result_list = []
@@ -172,10 +355,10 @@ class Neo4jDB:
 
             result = session.run(
                 vector_search_query,
-                question=question,
-                openai_key=Config.OPENAI_API_KEY,
+                question_embedding=question_embedding,
                 index_name=index_name,
-                top_k=2,
+                candidates=candidates,
+                top_k=top_k,
             )
             for node in result:
                 score = node[0]
@@ -191,6 +374,18 @@ class Neo4jDB:
         search_result_list.sort(key=lambda x: x[0], reverse=True)
         return search_result_list
 
+    def get_section(self, query_id: str, label: str) -> Section | None:
+        get_section_query = f"""
+            MATCH (node:{label} {{id: $id}})
+            RETURN node
+        """
+
+        with self.kg.session(database=Config.NEO4J_DATABASE) as session:
+            result = session.run(get_section_query, id=str(query_id))
+            for record in result:
+                return self.__convert_neo4j_node_to_section(record["node"])
+        return None
+
     def search_path(self, query_id: str, label: str) -> list[Section]:
         graph_search_query = f"""
             MATCH p = (doc:Document)-[*]->(node:{label} {{id: $id}})
@@ -0,0 +1,18 @@
+import hashlib
+import uuid
+
+
+# Fixed namespace so the same hierarchy path always maps to the same node id across loads
+NODE_ID_NAMESPACE = uuid.UUID("6f1c2f0e-7a43-5b8e-9d7a-3c1e0b5a9f42")
+
+
+def make_node_id(key: str) -> str:
+    return str(uuid.uuid5(NODE_ID_NAMESPACE, key))
+
+
+def make_content_hash(*parts: str) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
@@ -1,16 +1,64 @@
 from pinecone.grpc import PineconeGRPC as Pinecone
 
 from config import Config
+from models.ingest_stats import IngestStats
 
 
 class PineconeDB:
-    def __init__(self):
+    def __init__(self, stats: IngestStats | None = None):
         self.pc = Pinecone(api_key=Config.PINECONE_API_KEY)
         self.index = self.pc.Index(Config.PINECONE_INDEX_NAME)
+        self.stats = stats or IngestStats()
 
-    def upsert(self, records: list[dict]) -> None:
-        self.index.upsert(vectors=records)
+    def upsert(self, records: list[dict], batch_size: int = 100) -> None:
+        with self.stats.stage("write"):
+            for i in range(0, len(records), batch_size):
+                self.stats.count("db_round_trips")
+                self.index.upsert(vectors=records[i : i + batch_size])
 
     def query(self, query_embedding: list[float], top_k: int = 1) -> list[dict]:
         results = self.index.query(vector=query_embedding, top_k=top_k, include_metadata=True)
         return results
+
+    def count(self) -> int:
+        with self.stats.stage("diff"):
+            self.stats.count("db_round_trips")
+            return self.index.describe_index_stats().total_vector_count
+
+    def dimension(self) -> int:
+        with self.stats.stage("diff"):
+            self.stats.count("db_round_trips")
+            return self.index.describe_index_stats().dimension
+
+    def list_ids(self, prefix: str | None = None) -> list[str]:
+        ids = []
+        with self.stats.stage("diff"):
+            for page in self.index.list(prefix=prefix):
+                self.stats.count("db_round_trips")
+                ids.extend(page)
+        return ids
+
+    def fetch_metadata(self, ids: list[str]) -> dict[str, dict]:
+        if not ids:
+            return {}
+        with self.stats.stage("diff"):
+            self.stats.count("db_round_trips")
+            response = self.index.fetch(ids=ids)
+        return {id: vector.metadata for id, vector in response.vectors.items()}
+
+    def fetch_vectors(self, ids: list[str]) -> dict[str, tuple[list[float], dict]]:
+        if not ids:
+            return {}
+        response = self.index.fetch(ids=ids)
+        return {id: (list(vector.values), vector.metadata) for id, vector in response.vectors.items()}
+
+    def update_metadata(self, id: str, metadata: dict) -> None:
+        with self.stats.stage("write"):
+            self.stats.count("db_round_trips")
+            self.index.update(id=id, set_metadata=metadata)
+
+    def delete(self, ids: list[str], batch_size: int = 1000) -> None:
+        with self.stats.stage("write"):
+            for i in range(0, len(ids), batch_size):
+                self.stats.count("db_round_trips")
+                self.index.delete(ids=ids[i : i + batch_size])
@@ -0,0 +1,123 @@
+from typing import Callable
+
+from models.citation import make_citation
+from models.hierarchy_type import HierarchyType
+from models.node_identity import make_content_hash, make_node_id
+
+
+class SectionRecord:
+    # Lightweight section used while ingesting. The parent is referenced by id and the text is
+    # accumulated in a buffer, so a finished record can be written and dropped immediately.
+    # The id is derived from the hierarchy path, so the same section keeps its id across editions.
+    __slots__ = (
+        "_id",
+        "path",
+        "citation",
+        "level",
+        "hierarchy",
+        "title",
+        "page_num",
+        "parent_id",
+        "parent_hierarchy",
+        "_text_parts",
+        "_content_hash",
+    )
+
+    def __init__(
+        self,
+        level: int,
+        page_num: int,
+        hierarchy: HierarchyType = HierarchyType.section,
+        title: str = "",
+        text: str = "",
+    ):
+        self.path = title
+        self._id: str | None = None
+        self.citation = ""
+        self.level = level
+        self.hierarchy = hierarchy
+        self.title = title
+        self.page_num = page_num
+        self.parent_id: str | None = None
+        self.parent_hierarchy: HierarchyType | None = None
+        self._text_parts = [text] if text else []
+        self._content_hash: str | None = None
+
+    @property
+    def id(self) -> str:
+        # Hashed on first use, after SectionStream.push has set the final path
+        if self._id is None:
+            self._id = make_node_id(self.path)
+        return self._id
+
+    @property
+    def text(self) -> str:
+        if len(self._text_parts) > 1:
+            self._text_parts = ["".join(self._text_parts)]
+        return self._text_parts[0] if self._text_parts else ""
+
+    @property
+    def content_hash(self) -> str:
+        # Read by the diff and again by the write, so the text is hashed once unless it grows
+        if self._content_hash is None:
+            self._content_hash = make_content_hash(self.title, self.text)
+        return self._content_hash
+
+    def append_text(self, text: str) -> None:
+        if text:
+            self._text_parts.append(text)
+            self._content_hash = None
+
+    def __str__(self) -> str:
+        return self.text
+
+
+class SectionStream:
+    # Keeps only the open path from the document root to the current section. A section is handed
+    # to the sink as soon as a sibling or an ancestor's sibling closes it, so memory is bounded by
+    # the depth of the hierarchy instead of the size of the document.
+    def __init__(self, head: SectionRecord, sink: Callable[[SectionRecord], None]):
+        self.stack = [head]
+        self.sink = sink
+        # Keys already used by the children of each open section, to tell repeated headers apart
+        self.child_titles: list[dict[str, int]] = [{}]
+        # Title of the last cited child ("§1. Tax imposed", "(a) In general") of each open section
+        self.anchors: list[str | None] = [None]
+
+    def append_text(self, text: str) -> None:
+        self.stack[-1].append_text(text)
+
+    def push(self, section: SectionRecord) -> None:
+        # The document root is never closed by a new section
+        while len(self.stack) > 1 and section.level <= self.stack[-1].level:
+            self.child_titles.pop()
+            self.anchors.pop()
+            self.sink(self.stack.pop())
+
+        parent = self.stack[-1]
+        section.citation = make_citation(parent.citation, section.hierarchy, section.title)
+        # Headers that repeat between cited siblings, such as "EDITORIAL NOTES" after each section of a
+        # part, are keyed by the cited sibling they follow. Inserting or removing a section then leaves
+        # the ids of the other sections' notes unchanged. The occurrence count is only a fallback.
+        if section.citation:
+            self.anchors[-1] = section.title
+            key = section.title
+        elif self.anchors[-1] is not None:
+            key = f"{self.anchors[-1]}/{section.title}"
+        else:
+            key = section.title
+        occurrence = self.child_titles[-1].get(key, 0)
+        self.child_titles[-1][key] = occurrence + 1
+
+        section.path = f"{parent.path}/{key}" if occurrence == 0 else f"{parent.path}/{key}#{occurrence}"
+        section.parent_id = parent.id
+        section.parent_hierarchy = parent.hierarchy
+        self.stack.append(section)
+        self.child_titles.append({})
+        self.anchors.append(None)
+
+    def close(self) -> None:
+        while self.stack:
+            self.child_titles.pop()
+            self.anchors.pop()
+            self.sink(self.stack.pop())
@@ -0,0 +1,261 @@
+import json
+import os
+
+import numpy as np
+
+from config import Config
+from models.columnar_table import load_table, save_table
+from models.hierarchy_type import HierarchyType
+from models.lexical_index import LEXICAL_STRING_COLUMNS, LexicalIndex
+from models.neo4j_db import Neo4jDB
+from models.pinecone_db import PineconeDB
+
+
+# A snapshot is a directory of columnar .npz tables. Strings are stored as one UTF-8 buffer plus
+# offsets and embeddings as one float32 matrix, so nothing needs pickle to be read back.
+NEO4J_NODES_FILE = "neo4j_nodes.npz"
+NEO4J_EDGES_FILE = "neo4j_edges.npz"
+PINECONE_FILE = "pinecone.npz"
+LEXICAL_INDEX_DIR = "lexical_index"
+METADATA_FILE = "metadata.json"
+
+NODE_STRING_COLUMNS = ["id", "label", "hierarchy", "title", "text", "content_hash"]
+EDGE_STRING_COLUMNS = ["parent_id", "parent_label", "type", "child_id", "child_label"]
+PINECONE_STRING_COLUMNS = ["id", "text", "content_hash"]
+
+
+# region Embeddings
+class EmbeddingBuffer:
+    # Copies each embedding into a float32 matrix as the records stream in, so an export never holds
+    # every embedding as a list of Python floats. Rows without an embedding stay zero and are masked.
+    def __init__(self, capacity: int = 4096):
+        self.embeddings = np.zeros((capacity, Config.EMBEDDING_DIMENSIONS), dtype=np.float32)
+        self.has_embedding = np.zeros(capacity, dtype=bool)
+        self.size = 0
+
+    def append(self, id: str, embedding: list[float] | None) -> None:
+        if embedding is not None and len(embedding) != Config.EMBEDDING_DIMENSIONS:
+            raise ValueError(
+                f"Embedding of {id} has {len(embedding)} dimensions, but the config uses {Config.EMBEDDING_DIMENSIONS}. "
+                "Load the data again with the current config before exporting it"
+            )
+        if self.size == len(self.embeddings):
+            self.embeddings = np.concatenate([self.embeddings, np.zeros_like(self.embeddings)])
+            self.has_embedding = np.concatenate([self.has_embedding, np.zeros_like(self.has_embedding)])
+        if embedding is not None:
+            self.embeddings[self.size] = embedding
+            self.has_embedding[self.size] = True
+        self.size += 1
+
+    def arrays(self) -> tuple[np.ndarray, np.ndarray]:
+        return self.embeddings[: self.size], self.has_embedding[: self.size]
+
+
+# endregion
+
+
+# region Metadata
+def write_metadata(directory: str) -> None:
+    metadata = {"embedding_model": Config.EMBEDDING_MODEL, "embedding_dimensions": Config.EMBEDDING_DIMENSIONS}
+    with open(os.path.join(directory, METADATA_FILE), "w") as file:
+        json.dump(metadata, file, indent=4)
+
+
+def check_metadata(directory: str) -> None:
+    with open(os.path.join(directory, METADATA_FILE), "r") as file:
+        metadata = json.load(file)
+    if (
+        metadata["embedding_model"] != Config.EMBEDDING_MODEL
+        or metadata["embedding_dimensions"] != Config.EMBEDDING_DIMENSIONS
+    ):
+        raise ValueError(
+            f"Snapshot embeddings use {metadata['embedding_model']} with {metadata['embedding_dimensions']} dimensions, "
+            f"but the config uses {Config.EMBEDDING_MODEL} with {Config.EMBEDDING_DIMENSIONS} dimensions"
+        )
+
+
+# endregion
+
+
+# region Neo4j
+def export_neo4j(neo4j_db: Neo4jDB, directory: str) -> tuple[int, int]:
+    os.makedirs(directory, exist_ok=True)
+
+    nodes = {name: [] for name in NODE_STRING_COLUMNS}
+    level_list = []
+    page_num_list = []
+    embedding_buffer = EmbeddingBuffer()
+    for hierarchy in HierarchyType:
+        label = hierarchy.value[1]
+        for node in neo4j_db.export_nodes(label):
+            nodes["id"].append(node["id"])
+            nodes["label"].append(label)
+            nodes["hierarchy"].append(node["hierarchy"])
+            nodes["title"].append(node["title"])
+            nodes["text"].append(node["text"])
+            nodes["content_hash"].append(node["content_hash"])
+            if node["embedding"] is not None and node["embedding_version"] != Config.EMBEDDING_VERSION:
+                raise ValueError(
+                    f"{label} {node['id']} was embedded with {node['embedding_version']}, but the config uses "
+                    f"{Config.EMBEDDING_VERSION}. Load the data again with the current config before exporting it"
+                )
+            level_list.append(node["level"] or 0)
+            page_num_list.append(node["page_num"] or 0)
+            embedding_buffer.append(node["id"], node["embedding"])
+
+    embeddings, has_embedding = embedding_buffer.arrays()
+    save_table(
+        os.path.join(directory, NEO4J_NODES_FILE),
+        string_columns=nodes,
+        array_columns={
+            "level": np.asarray(level_list, dtype=np.int32),
+            "page_num": np.asarray(page_num_list, dtype=np.int32),
+            "embedding": embeddings,
+            "has_embedding": has_embedding,
+        },
+    )
+
+    edges = {name: [] for name in EDGE_STRING_COLUMNS}
+    for edge in neo4j_db.export_edges():
+        for name in EDGE_STRING_COLUMNS:
+            edges[name].append(edge[name])
+    save_table(os.path.join(directory, NEO4J_EDGES_FILE), string_columns=edges, array_columns={})
+
+    # Written last, once every embedding has been checked against the config it records
+    write_metadata(directory)
+
+    return len(nodes["id"]), len(edges["parent_id"])
+
+
+def import_neo4j(neo4j_db: Neo4jDB, directory: str) -> tuple[int, int]:
+    check_metadata(directory)
+
+    nodes, node_arrays = load_table(os.path.join(directory, NEO4J_NODES_FILE), NODE_STRING_COLUMNS)
+    rows_by_label: dict[str, list[dict]] = {}
+    for i, id in enumerate(nodes["id"]):
+        rows_by_label.setdefault(nodes["label"][i], []).append(
+            {
+                "id": id,
+                "level": int(node_arrays["level"][i]),
+                "hierarchy": nodes["hierarchy"][i],
+                "title": nodes["title"][i],
+                "text": nodes["text"][i],
+                "page_num": int(node_arrays["page_num"][i]),
+                "content_hash": nodes["content_hash"][i] or None,
+                # Row of the embedding matrix, converted to a list only when its batch is written
+                "embedding_row": i if node_arrays["has_embedding"][i] else None,
+            }
+        )
+
+    # Edges are matched by id, so the id indexes must exist before they are written
+    for label, rows in rows_by_label.items():
+        neo4j_db.create_id_index(label)
+        neo4j_db.import_nodes(label, rows, node_arrays["embedding"])
+
+    edges, _ = load_table(os.path.join(directory, NEO4J_EDGES_FILE), EDGE_STRING_COLUMNS)
+    rows_by_type: dict[tuple[str, str, str], list[dict]] = {}
+    for i, parent_id in enumerate(edges["parent_id"]):
+        key = (edges["parent_label"][i], edges["type"][i], edges["child_label"][i])
+        rows_by_type.setdefault(key, []).append({"parent_id": parent_id, "child_id": edges["child_id"][i]})
+
+    for (parent_label, relationship, child_label), rows in rows_by_type.items():
+        neo4j_db.import_edges(parent_label, relationship, child_label, rows)
+
+    for label in rows_by_label:
+        neo4j_db.create_vector_index(label)
+
+    return len(nodes["id"]), len(edges["parent_id"])
+
+
+# endregion
+
+
+# region Pinecone
+def export_pinecone(pinecone_db: PineconeDB, directory: str, batch_size: int = 100) -> int:
+    os.makedirs(directory, exist_ok=True)
+
+    vectors = {name: [] for name in PINECONE_STRING_COLUMNS}
+    page_num_list = []
+    embedding_buffer = EmbeddingBuffer()
+    ids = pinecone_db.list_ids()
+    for i in range(0, len(ids), batch_size):
+        for id, (values, metadata) in pinecone_db.fetch_vectors(ids[i : i + batch_size]).items():
+            vectors["id"].append(id)
+            vectors["text"].append(metadata.get("text", ""))
+            vectors["content_hash"].append(metadata.get("content_hash", ""))
+            if metadata.get("embedding_version") != Config.EMBEDDING_VERSION:
+                raise ValueError(
+                    f"Vector {id} was embedded with {metadata.get('embedding_version')}, but the config uses "
+                    f"{Config.EMBEDDING_VERSION}. Load the data again with the current config before exporting it"
+                )
+            page_num_list.append(int(metadata.get("page_num", 0)))
+            embedding_buffer.append(id, values)
+
+    embeddings, _ = embedding_buffer.arrays()
+    save_table(
+        os.path.join(directory, PINECONE_FILE),
+        string_columns=vectors,
+        array_columns={"page_num": np.asarray(page_num_list, dtype=np.int32), "embedding": embeddings},
+    )
+    write_metadata(directory)
+    return len(vectors["id"])
+
+
+def import_pinecone(pinecone_db: PineconeDB, directory: str, batch_size: int = 100) -> int:
+    check_metadata(directory)
+
+    vectors, vector_arrays = load_table(os.path.join(directory, PINECONE_FILE), PINECONE_STRING_COLUMNS)
+    for start in range(0, len(vectors["id"]), batch_size):
+        records = []
+        for i in range(start, min(start + batch_size, len(vectors["id"]))):
+            records.append(
+                {
+                    "id": vectors["id"][i],
+                    "values": vector_arrays["embedding"][i].tolist(),
+                    "metadata": {
+                        "text": vectors["text"][i],
+                        "page_num": int(vector_arrays["page_num"][i]),
+                        "content_hash": vectors["content_hash"][i],
+                        "embedding_version": Config.EMBEDDING_VERSION,
+                    },
+                }
+            )
+        pinecone_db.upsert(records, batch_size=batch_size)
+    return len(vectors["id"])
+
+
+# endregion
+
+
+# region Lexical Index
+def copy_lexical_index(source_directory: str, target_directory: str) -> int:
+    # The index is kept as one table per document, so a later load of a document replaces only its own
+    # table. Every table is read back before it is written, so a broken file fails here and not in the chatbot.
+    if not os.path.isdir(source_directory):
+        return 0
+    os.makedirs(target_directory, exist_ok=True)
+    node_count = 0
+    for file_name in sorted(os.listdir(source_directory)):
+        if file_name.endswith(".npz"):
+            columns = load_table(os.path.join(source_directory, file_name), LEXICAL_STRING_COLUMNS)
+            lexical_index = LexicalIndex.from_columns(*columns)
+            lexical_index.save(target_directory, document_id=file_name[: -len(".npz")])
+            node_count += len(lexical_index.nodes)
+    return node_count
+
+
+def export_lexical_index(directory: str) -> int:
+    # Tables of documents exported earlier but no longer loaded are removed
+    snapshot_directory = os.path.join(directory, LEXICAL_INDEX_DIR)
+    if os.path.isdir(snapshot_directory):
+        for file_name in os.listdir(snapshot_directory):
+            if file_name.endswith(".npz"):
+                os.remove(os.path.join(snapshot_directory, file_name))
+    return copy_lexical_index(Config.LEXICAL_INDEX_DIR, snapshot_directory)
+
+
+def import_lexical_index(directory: str) -> int:
+    return copy_lexical_index(os.path.join(directory, LEXICAL_INDEX_DIR), Config.LEXICAL_INDEX_DIR)
+
+
+# endregion
@@ -0,0 +1,46 @@
+from models.citation import find_citations
+from models.hierarchy_type import HierarchyType
+from models.lexical_index import LexicalIndex
+from models.section_record import SectionRecord
+
+
+def make_lexical_index(*citation_list: str) -> LexicalIndex:
+    lexical_index = LexicalIndex()
+    for citation in citation_list:
+        section = SectionRecord(level=5, page_num=1, hierarchy=HierarchyType.section, title=citation)
+        section.citation = citation
+        lexical_index.add_section(section)
+    return lexical_index
+
+
+def test_find_citations_with_section_prefix():
+    assert find_citations("What does §162(a)(1) say?") == [("162(a)(1)", 3)]
+    assert find_citations("See section 61 and sec. 401 (k)") == [("61", 2), ("401(k)", 3)]
+
+
+def test_find_citations_with_bare_number_needs_subdivision():
+    assert find_citations("Can I contribute to a 401(k) in 2023?") == [("401(k)", 6)]
+    assert find_citations("Is 1 (h)(2) still in effect?") == [("1(h)(2)", 4)]
+    assert find_citations("The limit is 3000 dollars") == []
+
+
+def test_find_citations_rejects_words_and_years_as_subdivisions():
+    assert find_citations("Pick 3 (three) items") == []
+    assert find_citations("Where do I file Form 1040 (2023)?") == []
+    assert find_citations("What goes in Box 1 (wages)?") == []
+    assert find_citations("Under §162 (2023) rules") == [("162", 3)]
+
+
+def test_lookup_citations_falls_back_to_ancestor():
+    lexical_index = make_lexical_index("162", "162(a)", "401(k)")
+    assert lexical_index.lookup_citations("What about §162(a)(9)?") == lexical_index.citations["162(a)"]
+    assert lexical_index.lookup_citations("What about §162(z)?") == lexical_index.citations["162"]
+    assert lexical_index.lookup_citations("Is a 401(k)(1) loan taxable?") == lexical_index.citations["401(k)"]
+
+
+def test_lookup_citations_does_not_reduce_bare_number_to_section():
+    lexical_index = make_lexical_index("1", "3", "162")
+    assert lexical_index.lookup_citations("Is 1 (h) still in effect?") == []
+    assert lexical_index.lookup_citations("Pick 3 (three) items") == []
+    assert lexical_index.lookup_citations("What goes in Box 1 (wages)?") == []
+    assert lexical_index.lookup_citations("What about 162(a)(9)?") == []
@@ -0,0 +1,42 @@
+import pytest
+
+from models.hierarchy_type import HierarchyType, _check_hierarchy_type
+
+
+# Expected values are those of the original if/elif chain, including its quirks: "chapter" is
+# checked before "subchapter" and "part" matches inside words such as "Apartment".
+@pytest.mark.parametrize(
+    "title, hierarchy",
+    [
+        ("Subtitle A—Income Taxes", HierarchyType.subtitle),
+        ("CHAPTER 1—NORMAL TAXES AND SURTAXES", HierarchyType.chapter),
+        ("Subchapter A—Determination of Tax Liability", HierarchyType.chapter),
+        ("PART I—TAX ON INDIVIDUALS", HierarchyType.part),
+        ("§1. Tax imposed", HierarchyType.section),
+        ("§162. Trade or business expenses", HierarchyType.section),
+        ("TABLE OF CONTENTS", HierarchyType.table_of_contents),
+        ("EDITORIAL NOTES", HierarchyType.editorial_notes),
+        ("Editorial Notes", HierarchyType.editorial_notes),
+        ("AMENDMENTS", HierarchyType.amendments),
+        ("(a) In general", HierarchyType.section_l1),
+        ("(a) IN GENERAL", HierarchyType.section_l1),
+        ("(a) Apartment rules", HierarchyType.part),
+        ("(b) editorial notes", HierarchyType.editorial_notes),
+        ("(1) In general", HierarchyType.section_l2),
+        ("(A) In general", HierarchyType.section_l3),
+        ("(i) in the case of", HierarchyType.section_l4),
+        ("(iv) such", HierarchyType.section_l4),
+        ("Chunk 1", HierarchyType.chunk),
+        ("Internal Revenue Code", HierarchyType.document),
+        ("Statutory Notes and Related Subsidiaries", HierarchyType.document),
+    ],
+)
+def test_check_hierarchy_type(title, hierarchy):
+    assert HierarchyType.check_hierarchy_type(title) == hierarchy
+
+
+def test_check_hierarchy_type_is_cached():
+    _check_hierarchy_type.cache_clear()
+    HierarchyType.check_hierarchy_type("AMENDMENTS")
+    HierarchyType.check_hierarchy_type("AMENDMENTS")
+    assert _check_hierarchy_type.cache_info().hits == 1
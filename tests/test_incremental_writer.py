@@ -0,0 +1,75 @@
+from models.hierarchy_type import HierarchyType
+from models.incremental_writer import IncrementalWriter
+from models.ingest_stats import IngestStats
+from models.section_record import SectionRecord
+
+
+class FakeNeo4jDB:
+    # Records the calls IncrementalWriter makes instead of running them against a database
+    def __init__(self, content_hashes: dict[str, tuple[str, int, str]], legacy_nodes: list[tuple[str, str]] = ()):
+        self.content_hashes = content_hashes
+        self.legacy_nodes = list(legacy_nodes)
+        self.written: list[str] = []
+        self.moved: list[str] = []
+        self.deleted: list[tuple[str, list[str]]] = []
+
+    def get_legacy_nodes(self, document_title: str, document_id: str) -> list[tuple[str, str]]:
+        return self.legacy_nodes
+
+    def get_content_hashes(self, document_id: str) -> dict[str, tuple[str, int, str]]:
+        return self.content_hashes
+
+    def write_section(self, section: SectionRecord) -> None:
+        self.written.append(section.title)
+
+    def set_page_num(self, section: SectionRecord) -> None:
+        self.moved.append(section.title)
+
+    def delete_nodes(self, label: str, ids: list[str]) -> None:
+        self.deleted.append((label, ids))
+
+
+def make_section(title: str, text: str, page_num: int = 1) -> SectionRecord:
+    section = SectionRecord(level=5, page_num=page_num, hierarchy=HierarchyType.section, title=title, text=text)
+    section.path = f"Head/{title}"
+    return section
+
+
+def make_writer(neo4j_db: FakeNeo4jDB) -> IncrementalWriter:
+    head = SectionRecord(level=0, hierarchy=HierarchyType.document, page_num=1, title="Head")
+    return IncrementalWriter(neo4j_db, document=head, stats=IngestStats())
+
+
+def test_sections_are_routed_by_content_hash_and_page():
+    unchanged = make_section("§1. Tax imposed", "Same text")
+    moved = make_section("§2. Taxes", "Same text", page_num=3)
+    changed = make_section("§3. Credits", "New text")
+    new = make_section("§4. Deductions", "Text")
+    stale = make_section("§5. Repealed", "Old text")
+    neo4j_db = FakeNeo4jDB(
+        {
+            unchanged.id: (unchanged.content_hash, 1, "Section"),
+            moved.id: (moved.content_hash, 2, "Section"),
+            changed.id: (make_section("§3. Credits", "Old text").content_hash, 1, "Section"),
+            stale.id: (stale.content_hash, 1, "Section"),
+        }
+    )
+    writer = make_writer(neo4j_db)
+
+    for section in (unchanged, moved, changed, new):
+        writer(section)
+    deleted = writer.delete_stale()
+
+    assert neo4j_db.written == ["§3. Credits", "§4. Deductions"]
+    assert neo4j_db.moved == ["§2. Taxes"]
+    assert (writer.written, writer.moved, writer.unchanged) == (2, 1, 1)
+    assert neo4j_db.deleted == [("Section", [stale.id])]
+    assert deleted == 1
+
+
+def test_legacy_nodes_are_deleted_per_label():
+    neo4j_db = FakeNeo4jDB({}, legacy_nodes=[("a", "Document"), ("b", "Section"), ("c", "Section")])
+    writer = make_writer(neo4j_db)
+
+    assert neo4j_db.deleted == [("Document", ["a"]), ("Section", ["b", "c"])]
+    assert writer.legacy_deleted == 3
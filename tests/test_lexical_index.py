@@ -0,0 +1,26 @@
+from models.hierarchy_type import HierarchyType
+from models.lexical_index import LexicalIndex
+from models.section_record import SectionRecord
+
+
+def make_section(title: str, text: str, citation: str) -> SectionRecord:
+    section = SectionRecord(level=5, page_num=1, hierarchy=HierarchyType.section, title=title, text=text)
+    section.citation = citation
+    return section
+
+
+def test_save_and_load_round_trip(tmp_path):
+    first = LexicalIndex()
+    first.add_section(make_section("§162. Trade or business expenses", "Ordinary and necessary expenses", "162"))
+    first.save(str(tmp_path), document_id="first")
+    second = LexicalIndex()
+    second.add_section(make_section("§401. Qualified pension plans", "A cash or deferred arrangement", "401"))
+    second.save(str(tmp_path), document_id="second")
+
+    lexical_index = LexicalIndex.load(str(tmp_path))
+
+    assert lexical_index.nodes == first.nodes + second.nodes
+    assert lexical_index.citations == {**first.citations, **second.citations}
+    assert lexical_index.total_length == first.total_length + second.total_length
+    assert lexical_index.search("business expenses")[0][1] == first.nodes[0][0]
+    assert lexical_index.search("deferred arrangement")[0][1] == second.nodes[0][0]
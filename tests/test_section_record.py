@@ -0,0 +1,121 @@
+from models.hierarchy_type import HierarchyType
+from models.section_record import SectionRecord, SectionStream
+
+
+def make_head() -> SectionRecord:
+    return SectionRecord(level=HierarchyType.document.value[0], hierarchy=HierarchyType.document, page_num=1, title="Head")
+
+
+def make_section(level: int, title: str) -> SectionRecord:
+    return SectionRecord(level=level, page_num=1, hierarchy=HierarchyType.check_hierarchy_type(title), title=title)
+
+
+def test_sections_are_closed_by_siblings_and_ancestor_siblings():
+    closed = []
+    head = make_head()
+    stream = SectionStream(head, sink=closed.append)
+
+    stream.push(make_section(4, "PART I—TAX ON INDIVIDUALS"))
+    stream.push(make_section(5, "§1. Tax imposed"))
+    stream.push(make_section(6, "(a) In general"))
+    assert [section.title for section in stream.stack] == [
+        "Head",
+        "PART I—TAX ON INDIVIDUALS",
+        "§1. Tax imposed",
+        "(a) In general",
+    ]
+    assert closed == []
+
+    stream.push(make_section(6, "(b) Special rules"))
+    assert [section.title for section in closed] == ["(a) In general"]
+
+    stream.push(make_section(4, "PART II—TAX ON CORPORATIONS"))
+    assert [section.title for section in closed] == [
+        "(a) In general",
+        "(b) Special rules",
+        "§1. Tax imposed",
+        "PART I—TAX ON INDIVIDUALS",
+    ]
+    assert len(stream.stack) == 2
+
+    stream.close()
+    assert [section.title for section in closed[-2:]] == ["PART II—TAX ON CORPORATIONS", "Head"]
+    assert stream.stack == []
+
+
+def test_document_root_is_never_closed_by_push():
+    closed = []
+    head = make_head()
+    stream = SectionStream(head, sink=closed.append)
+
+    stream.push(make_section(0, "Introduction"))
+    stream.push(make_section(0, "Overview"))
+
+    assert [section.title for section in closed] == ["Introduction"]
+    assert stream.stack[0] is head
+    assert stream.stack[-1].parent_id == head.id
+
+
+def test_parent_and_text_are_set_on_push():
+    head = make_head()
+    stream = SectionStream(head, sink=lambda section: None)
+    section = make_section(5, "§162. Trade or business expenses")
+
+    stream.push(section)
+    stream.append_text("There shall be allowed ")
+    stream.append_text("as a deduction")
+
+    assert section.parent_id == head.id
+    assert section.parent_hierarchy == HierarchyType.document
+    assert section.citation == "162"
+    assert section.text == "There shall be allowed as a deduction"
+
+
+def load(outline: list[tuple[int, str, str]]) -> list[SectionRecord]:
+    closed = []
+    stream = SectionStream(make_head(), sink=closed.append)
+    for level, title, text in outline:
+        section = make_section(level, title)
+        stream.push(section)
+        stream.append_text(text)
+    stream.close()
+    return closed
+
+
+def make_outline(section_numbers: list[str]) -> list[tuple[int, str, str]]:
+    outline = [(4, "PART I—TAX ON INDIVIDUALS", ""), (5, "TABLE OF CONTENTS", "Sections of this part")]
+    for number in section_numbers:
+        outline += [
+            (5, f"§{number}. Section {number}", f"Text of section {number}"),
+            (6, "(a) In general", f"General rule of section {number}"),
+            (5, "EDITORIAL NOTES", f"Notes on section {number}"),
+            (6, "AMENDMENTS", f"Amendments of section {number}"),
+        ]
+    return outline
+
+
+def test_ids_are_stable_across_loads():
+    first = load(make_outline(["1", "2", "3"]))
+    second = load(make_outline(["1", "2", "3"]))
+
+    assert [section.id for section in first] == [section.id for section in second]
+    assert len({section.id for section in first}) == len(first)
+
+
+def test_inserting_a_section_keeps_the_ids_of_the_other_notes():
+    before = {section.id: section.content_hash for section in load(make_outline(["1", "2", "3", "4"]))}
+    after = {section.id: section.content_hash for section in load(make_outline(["1", "1A", "2", "3", "4"]))}
+
+    # Only the nodes of the new section are added, every existing node keeps its id and content
+    assert before.items() <= after.items()
+    assert len(after) - len(before) == 4
+
+
+def test_content_hash_follows_appended_text():
+    section = make_section(5, "§1. Tax imposed")
+    section.append_text("There is hereby imposed")
+    content_hash = section.content_hash
+
+    assert section.content_hash == content_hash
+    section.append_text(" a tax")
+    assert section.content_hash != content_hash